@@ -0,0 +1,114 @@
+"""
+Асинхронный режим view для запуска под ASGI (настройка ASYNC_VIEWS).
+
+В Django 3.2 нет асинхронного ORM, а синхронные view под ASGI
+выполняются в одном потоке на процесс. async_view выполняет view DRF
+целиком, вместе с рендерингом ответа, в пуле из ASYNC_VIEW_THREADS
+потоков, поэтому запросы, ожидающие БД, обрабатываются параллельно,
+а цикл событий свободен для приема соединений. Соединения с БД потоков
+пула закрываются по правилам CONN_MAX_AGE, как в цикле запроса WSGI.
+
+Тело потокового ответа ASGIHandler Django 3.2 читает прямо в цикле
+событий. StreamingASGIHandler читает его в потоке того же пула и
+передает части в цикл событий по мере готовности, без буферизации.
+"""
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.db import close_old_connections
+from django.urls import URLResolver
+
+from api.common.connections import (check_connections,
+                                    mark_connections_used)
+from api.common.metrics import current_metrics, track_queries
+
+
+@functools.lru_cache(maxsize=None)
+def get_executor():
+    return ThreadPoolExecutor(
+        max_workers=settings.ASYNC_VIEW_THREADS, thread_name_prefix='view'
+    )
+
+
+def run_view(view, request, *args, **kwargs):
+    """Выполняет синхронный view в потоке пула."""
+    close_old_connections()
+    check_connections()
+    try:
+        with track_queries(current_metrics.get()):
+            response = view(request, *args, **kwargs)
+            if callable(getattr(response, 'render', None)):
+                response = response.render()
+        return response
+    finally:
+        close_old_connections()
+        mark_connections_used()
+
+
+def async_view(view):
+    """Асинхронная обертка синхронного view с атрибутами исходного."""
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        context = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(
+            get_executor(),
+            functools.partial(
+                context.run, run_view, view, request, *args, **kwargs
+            )
+        )
+
+    return wrapper
+
+
+def async_patterns(patterns):
+    """Заменяет view маршрутов patterns (и вложенных) обертками."""
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            async_patterns(pattern.url_patterns)
+        else:
+            pattern.callback = async_view(pattern.callback)
+    return patterns
+
+
+class StreamingASGIHandler(ASGIHandler):
+    """
+    ASGIHandler, который читает тело потоковых ответов в потоке пула
+    view. Заголовки и завершение ответа отправляет ASGIHandler.
+    """
+
+    async def send_response(self, response, send):
+        if not response.streaming:
+            return await super().send_response(response, send)
+        body = iter(response)
+        response.streaming_content = ()
+        loop = asyncio.get_running_loop()
+
+        async def send_after_body(message):
+            if message['type'] == 'http.response.body':
+                await loop.run_in_executor(
+                    get_executor(),
+                    functools.partial(self.stream_body, body, send, loop)
+                )
+            await send(message)
+
+        await super().send_response(response, send_after_body)
+
+    def stream_body(self, body, send, loop):
+        """Отправляет части тела, ожидая отправки каждой из них."""
+        close_old_connections()
+        check_connections()
+        try:
+            for part in body:
+                for chunk, _ in self.chunk_bytes(part):
+                    asyncio.run_coroutine_threadsafe(send({
+                        'type': 'http.response.body',
+                        'body': chunk,
+                        'more_body': True,
+                    }), loop).result()
+        finally:
+            close_old_connections()
+            mark_connections_used()
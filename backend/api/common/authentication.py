@@ -0,0 +1,98 @@
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.authentication import TokenAuthentication
+
+
+class TokenCache:
+    """
+    Кэш соответствия токена пользователю.
+
+    Если задан TOKEN_CACHE_ALIAS, данные хранятся в общем кэше Django и
+    сбрасываются сразу во всех воркерах. Иначе кэш отключен: отзыв токена
+    в одном воркере не дошел бы до остальных. Ограниченный LRU-кэш в
+    памяти процесса включается явно ненулевым TOKEN_CACHE_SIZE и подходит
+    только для одного процесса (после сброса в другом воркере запись
+    остается действительной до TOKEN_CACHE_TTL секунд).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = OrderedDict()
+
+    @property
+    def shared(self):
+        alias = settings.TOKEN_CACHE_ALIAS
+        return caches[alias] if alias else None
+
+    @staticmethod
+    def make_key(key):
+        return 'auth-token:' + hashlib.sha256(key.encode()).hexdigest()
+
+    def get(self, key):
+        cache_key = self.make_key(key)
+        shared = self.shared
+        if shared is not None:
+            return shared.get(cache_key)
+        if not settings.TOKEN_CACHE_SIZE:
+            return None
+        with self._lock:
+            entry = self._local.get(cache_key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._local[cache_key]
+                return None
+            self._local.move_to_end(cache_key)
+            return value
+
+    def set(self, key, value):
+        cache_key = self.make_key(key)
+        shared = self.shared
+        if shared is not None:
+            shared.set(cache_key, value, timeout=settings.TOKEN_CACHE_TTL)
+            return
+        if not settings.TOKEN_CACHE_SIZE:
+            return
+        with self._lock:
+            self._local[cache_key] = (
+                time.monotonic() + settings.TOKEN_CACHE_TTL, value
+            )
+            self._local.move_to_end(cache_key)
+            while len(self._local) > settings.TOKEN_CACHE_SIZE:
+                self._local.popitem(last=False)
+
+    def delete(self, *keys):
+        cache_keys = [self.make_key(key) for key in keys]
+        shared = self.shared
+        if shared is not None:
+            shared.delete_many(cache_keys)
+            return
+        with self._lock:
+            for cache_key in cache_keys:
+                self._local.pop(cache_key, None)
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Аутентификация по токену с кэшированием пользователя,
+    избавляющая от запроса Token + User на каждый запрос к API.
+    """
+
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is None:
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(key, (user, token))
+            return user, token
+        user, token = cached
+        return copy.copy(user), token
@@ -0,0 +1,43 @@
+"""
+Проверка постоянных соединений с БД (CONN_MAX_AGE) в начале запроса.
+
+В Django 3.2 нет CONN_HEALTH_CHECKS: соединение, закрытое сервером или
+пулером за время простоя, обнаруживается только ошибкой первого
+SQL-запроса. Поэтому соединение, простаивавшее дольше
+DB_HEALTH_CHECK_IDLE секунд, проверяется до обработки запроса, а
+неработающее закрывается, и Django открывает новое. Соединения, только
+что использованные другим запросом, не проверяются: при потоке запросов
+лишний запрос к БД на каждый из них не нужен.
+"""
+import time
+
+from django.conf import settings
+from django.db import connections
+
+from api.common.metrics import registry
+
+
+def check_connections():
+    """Проверяет простаивавшие открытые соединения с БД текущего потока."""
+    if not settings.DB_HEALTH_CHECKS:
+        return
+    now = time.monotonic()
+    for connection in connections.all():
+        if connection.connection is None or connection.in_atomic_block:
+            continue
+        last_used = getattr(connection, 'last_used_at', None)
+        if (last_used is not None
+                and now - last_used < settings.DB_HEALTH_CHECK_IDLE):
+            continue
+        registry.count_connection(connection.alias, 'checked')
+        if not connection.is_usable():
+            registry.count_connection(connection.alias, 'failed_check')
+            connection.close()
+
+
+def mark_connections_used():
+    """Отмечает время использования открытых соединений текущего потока."""
+    now = time.monotonic()
+    for connection in connections.all():
+        if connection.connection is not None:
+            connection.last_used_at = now
@@ -0,0 +1,288 @@
+import atexit
+import bisect
+import json
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+DURATION_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+METRIC_GROUPS = ('requests', 'durations', 'sums', 'slow', 'connections')
+
+current_metrics = ContextVar('current_metrics', default=None)
+
+
+class RequestMetrics:
+    """
+    Замеры одного запроса. Объект подключается к соединениям с БД
+    через connection.execute_wrapper и считает запросы и время в БД;
+    тексты SQL сохраняются только при capture_sql (для поиска
+    повторяющихся запросов).
+    """
+
+    def __init__(self, capture_sql=False):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        self.render_time = 0.0
+        self.serializing = False
+        self.capture_sql = capture_sql
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+            if self.capture_sql:
+                self.statements[sql] += 1
+
+    @property
+    def total_time(self):
+        return time.perf_counter() - self.started
+
+    def duplicates(self, threshold):
+        """SQL-запросы, выполненные не менее threshold раз."""
+        return [
+            (sql, count) for sql, count in self.statements.most_common()
+            if count >= threshold
+        ]
+
+
+@contextmanager
+def track_queries(metrics):
+    """Подключает замеры к соединениям с БД текущего потока."""
+    if metrics is None:
+        yield
+        return
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(metrics))
+        yield
+
+
+@contextmanager
+def serialize_timer():
+    """
+    Учитывает время сериализации без запросов к БД в замерах текущего
+    запроса. Вложенные сериализаторы повторно не учитываются.
+    """
+    metrics = current_metrics.get()
+    if metrics is None or metrics.serializing:
+        yield
+        return
+    metrics.serializing = True
+    started, db_time = time.perf_counter(), metrics.db_time
+    try:
+        yield
+    finally:
+        metrics.serializing = False
+        metrics.serialize_time += (
+            time.perf_counter() - started - (metrics.db_time - db_time)
+        )
+
+
+@contextmanager
+def render_timer():
+    """Учитывает время рендеринга ответа в замерах текущего запроса."""
+    metrics = current_metrics.get()
+    if metrics is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.render_time += time.perf_counter() - started
+
+
+class MetricsRegistry:
+    """
+    Агрегированные замеры запросов по маршрутам.
+
+    Счетчики копятся в памяти процесса. Если задан METRICS_DIR, фоновый
+    поток раз в METRICS_FLUSH_INTERVAL секунд сохраняет изменившиеся
+    счетчики в файл <pid>.json этого каталога, а render() суммирует
+    файлы всех процессов: api/metrics/ отдает общие значения из любого
+    воркера.
+    Файлы завершившихся воркеров остаются, чтобы счетчики не убывали
+    (каталог очищается при запуске gunicorn). Без METRICS_DIR метрики
+    относятся к одному процессу и помечены меткой pid.
+    """
+
+    def __init__(self):
+        self._reset()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        """Начальное состояние; в воркере после fork - без данных мастера."""
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pid = os.getpid()
+        self._changed = False
+        self._flusher = None
+        self._counters = {group: Counter() for group in METRIC_GROUPS}
+
+    def _changing(self):
+        """Счетчики для изменения; запускает сохранение в METRICS_DIR."""
+        counters = self._counters
+        self._changed = True
+        if self._flusher is None and settings.METRICS_DIR:
+            self._flusher = threading.Thread(
+                target=self._flush_periodically, name='metrics-flush',
+                daemon=True
+            )
+            self._flusher.start()
+        return counters
+
+    def _flush_periodically(self):
+        while True:
+            time.sleep(settings.METRICS_FLUSH_INTERVAL)
+            self.flush()
+
+    def count_connection(self, alias, event):
+        """Учитывает событие соединения с БД: opened, checked, failed_check."""
+        with self._lock:
+            self._changing()['connections'][(alias, event)] += 1
+
+    def observe(self, route, method, status, metrics, total_time, slow):
+        key = (route, method)
+        bucket = bisect.bisect_left(DURATION_BUCKETS, total_time)
+        with self._lock:
+            counters = self._changing()
+            counters['requests'][(*key, str(status))] += 1
+            counters['durations'][(*key, bucket)] += 1
+            sums = counters['sums']
+            sums[(*key, 'duration')] += total_time
+            sums[(*key, 'db')] += metrics.db_time
+            sums[(*key, 'serialize')] += metrics.serialize_time
+            sums[(*key, 'render')] += metrics.render_time
+            sums[(*key, 'queries')] += metrics.queries
+            if slow:
+                counters['slow'][key] += 1
+
+    def flush(self):
+        """Сохраняет изменившиеся счетчики процесса в METRICS_DIR."""
+        directory = settings.METRICS_DIR
+        if not directory:
+            return
+        with self._flush_lock:
+            with self._lock:
+                if not self._changed:
+                    return
+                self._changed = False
+                snapshot = {
+                    group: [[*key, value] for key, value in counter.items()]
+                    for group, counter in self._counters.items()
+                }
+            path = os.path.join(directory, f'{self._pid}.json')
+            os.makedirs(directory, exist_ok=True)
+            with open(f'{path}.tmp', 'w', encoding='utf-8') as file:
+                json.dump(snapshot, file)
+            os.replace(f'{path}.tmp', path)
+
+    def collect(self):
+        """Счетчики всех процессов из METRICS_DIR или текущего процесса."""
+        directory = settings.METRICS_DIR
+        if not directory:
+            with self._lock:
+                return {
+                    group: counter.copy()
+                    for group, counter in self._counters.items()
+                }
+        self.flush()
+        total = {group: Counter() for group in METRIC_GROUPS}
+        for name in os.listdir(directory):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(directory, name),
+                          encoding='utf-8') as file:
+                    snapshot = json.load(file)
+            except (OSError, ValueError):
+                continue
+            for group, rows in snapshot.items():
+                for *key, value in rows:
+                    total[group][tuple(key)] += value
+        return total
+
+    def render(self):
+        """Метрики в текстовом формате Prometheus."""
+        counters = self.collect()
+        extra_labels = {} if settings.METRICS_DIR else {'pid': os.getpid()}
+        lines = []
+
+        def labels(**values):
+            values.update(extra_labels)
+            return ','.join(
+                f'{name}="{value}"' for name, value in values.items()
+            )
+
+        lines.append('# TYPE foodgram_requests_total counter')
+        for (route, method, status), count in sorted(
+                counters['requests'].items()):
+            lines.append(
+                'foodgram_requests_total'
+                f'{{{labels(route=route, method=method, status=status)}}} '
+                f'{count}'
+            )
+        durations = counters['durations']
+        routes = sorted({(route, method) for route, method, _ in durations})
+        lines.append('# TYPE foodgram_request_duration_seconds histogram')
+        for route, method in routes:
+            cumulative = 0
+            for bucket, bound in enumerate((*DURATION_BUCKETS, '+Inf')):
+                cumulative += durations[(route, method, bucket)]
+                lines.append(
+                    'foodgram_request_duration_seconds_bucket'
+                    f'{{{labels(route=route, method=method, le=bound)}}} '
+                    f'{cumulative}'
+                )
+            lines.append(
+                'foodgram_request_duration_seconds_sum'
+                f'{{{labels(route=route, method=method)}}} '
+                f'{counters["sums"][(route, method, "duration")]:.6f}'
+            )
+            lines.append(
+                'foodgram_request_duration_seconds_count'
+                f'{{{labels(route=route, method=method)}}} {cumulative}'
+            )
+        for name, field in (
+                ('foodgram_db_duration_seconds_total', 'db'),
+                ('foodgram_serialize_duration_seconds_total', 'serialize'),
+                ('foodgram_render_duration_seconds_total', 'render'),
+                ('foodgram_db_queries_total', 'queries')):
+            lines.append(f'# TYPE {name} counter')
+            for route, method in routes:
+                value = counters['sums'][(route, method, field)]
+                value = int(value) if field == 'queries' else f'{value:.6f}'
+                lines.append(
+                    f'{name}{{{labels(route=route, method=method)}}} {value}'
+                )
+        lines.append('# TYPE foodgram_slow_requests_total counter')
+        for (route, method), count in sorted(counters['slow'].items()):
+            lines.append(
+                'foodgram_slow_requests_total'
+                f'{{{labels(route=route, method=method)}}} {count}'
+            )
+        lines.append('# TYPE foodgram_db_connection_events_total counter')
+        for (alias, event), count in sorted(counters['connections'].items()):
+            lines.append(
+                'foodgram_db_connection_events_total'
+                f'{{{labels(alias=alias, event=event)}}} {count}'
+            )
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+atexit.register(registry.flush)
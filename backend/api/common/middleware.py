@@ -0,0 +1,154 @@
+import asyncio
+import logging
+import random
+
+from django.conf import settings
+
+from api.common.metrics import (RequestMetrics, current_metrics, registry,
+                                track_queries)
+
+logger = logging.getLogger(__name__)
+
+
+def get_route(request):
+    """
+    Имя маршрута для меток метрик: класс и действие для вьюсетов DRF
+    (RecipeViewSet.list), имя URL или функции для остальных view.
+    """
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    view_class = getattr(match.func, 'cls', None)
+    if view_class is None:
+        return match.view_name or match.func.__name__
+    actions = getattr(match.func, 'actions', None) or {}
+    action = actions.get(request.method.lower(), request.method.lower())
+    return f'{view_class.__name__}.{action}'
+
+
+class RequestMetricsMiddleware:
+    """
+    Замеряет для каждого запроса общее время, количество и время
+    SQL-запросов и время рендеринга ответа.
+
+    Результаты добавляются в заголовок Server-Timing и в метрики
+    Prometheus (api/metrics/). Для доли запросов METRICS_SAMPLE_RATE
+    сохраняются тексты SQL: медленные запросы и запросы с повторяющимся
+    SQL (признак N+1) записываются в лог.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Признак для Django: экземпляр обрабатывает запросы асинхронно.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        if not settings.METRICS_ENABLED:
+            return self.get_response(request)
+        metrics = self.start_metrics()
+        token = current_metrics.set(metrics)
+        try:
+            with track_queries(metrics):
+                response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        """
+        Обработка под ASGI. SQL-запросы учитываются в потоках, где
+        выполняются view (см. api.common.asyncviews).
+        """
+        if not settings.METRICS_ENABLED:
+            return await self.get_response(request)
+        metrics = self.start_metrics()
+        token = current_metrics.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.finish(request, response, metrics)
+
+    @staticmethod
+    def start_metrics():
+        return RequestMetrics(
+            capture_sql=random.random() < settings.METRICS_SAMPLE_RATE
+        )
+
+    def finish(self, request, response, metrics):
+        if settings.METRICS_SERVER_TIMING:
+            response['Server-Timing'] = self.server_timing(
+                metrics, metrics.total_time
+            )
+        if response.streaming:
+            response.streaming_content = self.track_stream(
+                request, response, metrics
+            )
+        else:
+            self.observe(request, response, metrics)
+        return response
+
+    def track_stream(self, request, response, metrics):
+        """
+        Учитывает SQL-запросы, выполненные при чтении потокового ответа.
+        Заголовок Server-Timing отправляется до тела и содержит только
+        время до начала передачи; в метрики и лог попадает полное время.
+        """
+        content = response.streaming_content
+
+        def stream():
+            try:
+                with track_queries(metrics):
+                    yield from content
+            finally:
+                self.observe(request, response, metrics)
+
+        return stream()
+
+    def observe(self, request, response, metrics):
+        total_time = metrics.total_time
+        route = get_route(request)
+        slow = total_time * 1000 >= settings.METRICS_SLOW_REQUEST_MS
+        registry.observe(route, request.method, response.status_code,
+                         metrics, total_time, slow)
+        self.log(request, route, metrics, total_time, slow)
+
+    @staticmethod
+    def server_timing(metrics, total_time):
+        """
+        Фазы запроса в формате Server-Timing (миллисекунды). app - время
+        view без учета БД, сериализации и рендеринга.
+        """
+        app_time = max(
+            total_time - metrics.db_time - metrics.serialize_time
+            - metrics.render_time, 0
+        )
+        return ', '.join((
+            f'db;dur={metrics.db_time * 1000:.1f};'
+            f'desc="{metrics.queries} queries"',
+            f'serialize;dur={metrics.serialize_time * 1000:.1f}',
+            f'app;dur={app_time * 1000:.1f}',
+            f'render;dur={metrics.render_time * 1000:.1f}',
+            f'total;dur={total_time * 1000:.1f}',
+        ))
+
+    @staticmethod
+    def log(request, route, metrics, total_time, slow):
+        duplicates = metrics.duplicates(settings.METRICS_DUPLICATE_QUERIES)
+        if not slow and not duplicates:
+            return
+        message = [
+            '%s %s (%s): %.1f мс, запросов к БД: %d (%.1f мс)',
+        ]
+        args = [request.method, request.path, route, total_time * 1000,
+                metrics.queries, metrics.db_time * 1000]
+        for sql, count in duplicates[:5]:
+            message.append('  %d раз: %s')
+            args.extend((count, sql[:300]))
+        logger.warning('\n'.join(message), *args)
@@ -0,0 +1,117 @@
+from calendar import timegm
+
+from django.conf import settings
+from django.http import Http404
+from django.utils.cache import (get_conditional_response, patch_cache_control,
+                                patch_vary_headers)
+from django.utils.http import http_date, quote_etag, urlencode
+from rest_framework.response import Response
+
+
+class ReferenceDataMixin:
+    """
+    Миксин для вьюсетов справочников, отдающих данные из кэша
+    ReferenceDataCache и поддерживающих условные запросы.
+    """
+
+    reference_cache = None
+
+    def load_reference_data(self):
+        serializer = self.get_serializer(self.get_queryset(), many=True)
+        return [dict(item) for item in serializer.data]
+
+    def get_reference_data(self):
+        return self.reference_cache.get(self.load_reference_data)
+
+    def filter_reference_items(self, reference):
+        """Точка расширения для фильтрации данных справочника."""
+        return reference.items
+
+    def reference_response(self, reference, payload):
+        """Отдает 304, если у клиента актуальная версия данных."""
+        etag = quote_etag(reference.version)
+        last_modified = timegm(reference.last_modified.utctimetuple())
+        response = get_conditional_response(
+            self.request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = Response(payload)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        patch_cache_control(response, no_cache=True)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        reference = self.get_reference_data()
+        return self.reference_response(
+            reference, self.filter_reference_items(reference)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        reference = self.get_reference_data()
+        lookup = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+        try:
+            item = reference.by_id[int(lookup)]
+        except (KeyError, ValueError):
+            raise Http404
+        return self.reference_response(reference, item)
+
+
+class AnonymousResponseCacheMixin:
+    """
+    Миксин вьюсетов, кэширующий ответы list и retrieve для анонимных
+    пользователей в ResponseCache response_cache.
+
+    Ключ строится из хоста, действия, id объекта и отсортированных
+    значений параметров response_cache_params (остальные параметры
+    на ответ не влияют). Ответы содержат ETag и Cache-Control, поэтому
+    их могут кэшировать клиенты и proxy_cache nginx.
+    """
+
+    response_cache = None
+    response_cache_params = ()
+
+    def get_cache_parts(self):
+        params = self.request.query_params
+        query = urlencode(sorted(
+            (name, value) for name in self.response_cache_params
+            for value in params.getlist(name)
+        ))
+        lookup = self.kwargs.get(self.lookup_url_kwarg or self.lookup_field)
+        return self.request.get_host(), self.action, lookup, query
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if (request.user.is_authenticated
+                or self.response_cache.cache is None):
+            response = handler(request, *args, **kwargs)
+            patch_vary_headers(response, ('Authorization',))
+            return response
+        key, version, entry = self.response_cache.get(
+            *self.get_cache_parts()
+        )
+        if entry is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            entry = {
+                'data': response.data,
+                'etag': quote_etag(f'{version}-{key.rsplit(":", 1)[-1]}'),
+            }
+            self.response_cache.set(key, entry)
+        response = get_conditional_response(request, etag=entry['etag'])
+        if response is None:
+            response = Response(entry['data'])
+        response['ETag'] = entry['etag']
+        patch_cache_control(
+            response, public=True, max_age=settings.RESPONSE_CACHE_MAX_AGE
+        )
+        patch_vary_headers(response, ('Authorization',))
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
@@ -1,5 +1,50 @@
+import base64
+import binascii
+import json
+
 from django.conf import settings
-from rest_framework.pagination import PageNumberPagination
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from recipes.feed import feed_timelines
+
+
+class ApproximateCountPaginator(Paginator):
+    """
+    Пагинатор Django, который для запросов без условий WHERE в PostgreSQL
+    берет оценку количества строк из статистики таблицы вместо COUNT(*).
+    Включается настройкой APPROXIMATE_COUNT_THRESHOLD.
+    """
+
+    @cached_property
+    def count(self):
+        threshold = settings.APPROXIMATE_COUNT_THRESHOLD
+        query = getattr(self.object_list, 'query', None)
+        if threshold and query is not None and not query.where:
+            estimate = self.estimate_count(self.object_list)
+            if estimate is not None and estimate >= threshold:
+                return estimate
+        return super().count
+
+    @staticmethod
+    def estimate_count(queryset):
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE relname = %s',
+                [queryset.model._meta.db_table]
+            )
+            row = cursor.fetchone()
+        return int(row[0]) if row and row[0] >= 0 else None
 
 
 class PagePagination(PageNumberPagination):
@@ -7,3 +52,143 @@ class PagePagination(PageNumberPagination):
 
     page_size_query_param = 'limit'
     page_size = settings.DEFAULT_PAGE_SIZE
+    django_paginator_class = ApproximateCountPaginator
+
+
+class KeysetPagination(BasePagination):
+    """
+    Пагинатор по ключу сортировки (keyset) без COUNT(*) и OFFSET.
+
+    Курсор хранит значения полей сортировки последнего объекта страницы,
+    следующая страница выбирается условием по этим значениям. Порядок
+    задается атрибутом вьюсета keyset_ordering, последнее поле должно
+    быть уникальным.
+    """
+
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'limit'
+    page_size = settings.DEFAULT_PAGE_SIZE
+    max_page_size = settings.MAX_PAGE_SIZE
+    ordering = ('-pub_date', '-id')
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.ordering = getattr(view, 'keyset_ordering', self.ordering)
+        self.fields = [
+            queryset.model._meta.get_field(name.lstrip('-'))
+            for name in self.ordering
+        ]
+        page_size = self.get_page_size(request)
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request)
+        queryset = self.restrict_queryset(queryset, position, page_size)
+        if position is not None:
+            queryset = queryset.filter(self.position_filter(position))
+        results = list(queryset[:page_size + 1])
+        self.page = results[:page_size]
+        self.has_next = len(results) > page_size
+        return self.page
+
+    def restrict_queryset(self, queryset, position, page_size):
+        """
+        Сужает выборку перед условием по курсору. Подклассы могут
+        заранее ограничить ее известными id следующей страницы.
+        """
+        return queryset
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def position_filter(self, position):
+        """
+        Условие "после position" для составного ключа: первое
+        различающееся поле должно идти дальше в порядке сортировки.
+        """
+        condition = Q()
+        for index, name in enumerate(self.ordering):
+            lookup = 'lt' if name.startswith('-') else 'gt'
+            step = Q(**{f'{name.lstrip("-")}__{lookup}': position[index]})
+            for previous, value in zip(self.ordering[:index], position):
+                step &= Q(**{previous.lstrip('-'): value})
+            condition |= step
+        return condition
+
+    def encode_cursor(self, obj):
+        position = [field.value_to_string(obj) for field in self.fields]
+        return base64.urlsafe_b64encode(
+            json.dumps(position).encode()
+        ).decode()
+
+    def decode_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            if (not isinstance(position, list)
+                    or len(position) != len(self.fields)):
+                raise ValueError
+            return [
+                field.to_python(value)
+                for field, value in zip(self.fields, position)
+            ]
+        except (binascii.Error, TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(self.page[-1])
+        )
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+
+class FeedPagination(KeysetPagination):
+    """
+    Пагинатор ленты подписок по курсору. Страницы в пределах
+    сохраненной в кэше части ленты выбираются по id рецептов.
+    """
+
+    def restrict_queryset(self, queryset, position, page_size):
+        ids = feed_timelines.candidates(
+            self.request.user, position, page_size + 1
+        )
+        if ids is None:
+            return queryset
+        return queryset.filter(pk__in=ids)
+
+
+class HybridPagination(BasePagination):
+    """
+    Пагинатор, переключающийся между режимами по параметрам запроса:
+    page/limit по умолчанию и keyset при pagination=cursor или cursor=.
+    """
+
+    mode_query_param = 'pagination'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if (request.query_params.get(self.mode_query_param) == 'cursor'
+                or KeysetPagination.cursor_query_param
+                in request.query_params):
+            self.paginator = KeysetPagination()
+        else:
+            self.paginator = PagePagination()
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
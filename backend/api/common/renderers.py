@@ -0,0 +1,19 @@
+from rest_framework.renderers import BrowsableAPIRenderer, JSONRenderer
+
+from api.common.metrics import render_timer
+
+
+class TimedRendererMixin:
+    """Учитывает время рендеринга в замерах запроса (Server-Timing)."""
+
+    def render(self, *args, **kwargs):
+        with render_timer():
+            return super().render(*args, **kwargs)
+
+
+class TimedJSONRenderer(TimedRendererMixin, JSONRenderer):
+    pass
+
+
+class TimedBrowsableAPIRenderer(TimedRendererMixin, BrowsableAPIRenderer):
+    pass
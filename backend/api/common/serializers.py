@@ -1,25 +1,143 @@
 import base64
+import binascii
+import posixpath
+from collections import namedtuple
+from io import BytesIO
 
-from django.core.files.base import ContentFile
+from django.core.files.base import File
+from django.core.files.uploadedfile import UploadedFile
+from django.core.validators import get_available_image_extensions
 from rest_framework import serializers
 
-from recipes.models import Recipe
+from api.common.metrics import serialize_timer
+from recipes.images import (CHUNK_SIZE, ImageTooLargeError, InvalidImageError,
+                            check_data_size, read_image_header)
+from recipes.models import ImageJob, Recipe
 
+# Объем base64 (кратен 4), по которому проверяется заголовок изображения.
+HEADER_CHARS = 256 * 1024
 
-class Base64ImageField(serializers.ImageField):
-    """Кастомное поле изображений для преобразования из формата base64."""
+ImageUpload = namedtuple('ImageUpload', ('file', 'encoding'))
+
+
+class EncodedImageFile(File):
+    """
+    Файл с данными base64, которые начинаются с позиции offset строки
+    data URI. Данные отдаются кусками, без копирования всей строки.
+    """
+
+    def __init__(self, data, offset, name):
+        super().__init__(None, name)
+        self.data = data
+        self.offset = offset
+
+    @property
+    def size(self):
+        return len(self.data) - self.offset
+
+    def chunks(self, chunk_size=None):
+        chunk_size = chunk_size or CHUNK_SIZE
+        for start in range(self.offset, len(self.data), chunk_size):
+            yield self.data[start:start + chunk_size].encode('ascii')
+
+    def multiple_chunks(self, chunk_size=None):
+        return True
+
+    def close(self):
+        pass
+
+
+class Base64ImageField(serializers.Field):
+    """
+    Кастомное поле изображений в формате base64 (или файла при
+    multipart-запросе).
+
+    До постановки в очередь проверяются объем данных и заголовок
+    изображения, полное декодирование и проверка выполняются фоновой
+    обработкой (process_image_jobs). Возвращает ImageUpload.
+    """
+
+    default_error_messages = {
+        'invalid': 'Загрузите изображение в формате base64.',
+        'invalid_image': 'Загрузите корректное изображение.',
+        'extension': 'Неподдерживаемый формат изображения: {extension}.',
+    }
 
     def to_internal_value(self, data):
-        if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
+        if isinstance(data, UploadedFile):
+            return self.binary_upload(data)
+        if not isinstance(data, str) or not data.startswith('data:image/'):
+            self.fail('invalid')
+        separator = ';base64,'
+        position = data.find(separator)
+        if position == -1 or not data.isascii():
+            self.fail('invalid')
+        offset = position + len(separator)
+        extension = data[:position].split('/')[-1].lower()
+        self.check_extension(extension)
+        encoded_size = len(data) - offset
+        if not encoded_size:
+            self.fail('invalid')
+        self.check_size(encoded_size * 3 // 4)
+        head = ''.join(data[offset:offset + HEADER_CHARS].split())
+        try:
+            head = base64.b64decode(head[:len(head) - len(head) % 4],
+                                    validate=True)
+        except binascii.Error:
+            self.fail('invalid')
+        self.check_header(BytesIO(head),
+                          complete=encoded_size <= HEADER_CHARS)
+        return ImageUpload(
+            EncodedImageFile(data, offset, f'upload.{extension}.b64'),
+            ImageJob.Encoding.BASE64
+        )
+
+    def binary_upload(self, file):
+        """Проверяет изображение, загруженное multipart-запросом."""
+        self.check_extension(posixpath.splitext(file.name)[1][1:].lower())
+        self.check_size(file.size)
+        self.check_header(file, complete=True)
+        file.seek(0)
+        return ImageUpload(file, ImageJob.Encoding.BINARY)
+
+    def check_extension(self, extension):
+        if extension not in get_available_image_extensions():
+            self.fail('extension', extension=extension)
+
+    @staticmethod
+    def check_size(size):
+        try:
+            check_data_size(size)
+        except ImageTooLargeError as error:
+            raise serializers.ValidationError(str(error))
+
+    def check_header(self, file, complete):
+        """
+        Проверяет заголовок изображения. Если заголовок не поместился
+        в начало данных (complete=False), проверка откладывается
+        до фоновой обработки.
+        """
+        try:
+            read_image_header(file)
+        except ImageTooLargeError as error:
+            raise serializers.ValidationError(str(error))
+        except InvalidImageError:
+            if complete:
+                self.fail('invalid_image')
+
+    def to_representation(self, value):
+        return value.url if value else None
+
 
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
+class TimedSerializerMixin:
+    """Учитывает время сериализации в замерах запроса (Server-Timing)."""
 
-        return super().to_internal_value(data)
+    def to_representation(self, instance):
+        with serialize_timer():
+            return super().to_representation(instance)
 
 
-class RecipeShortSerializer(serializers.ModelSerializer):
+class RecipeShortSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Сериализатор объектов Recipe для получения краткого описания."""
 
     image = serializers.SerializerMethodField()
@@ -29,6 +147,4 @@ class RecipeShortSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'image', 'cooking_time')
 
     def get_image(self, obj):
-        if obj.image:
-            return obj.image.url
-        return None
+        return obj.get_image_url('card')
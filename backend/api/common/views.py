@@ -0,0 +1,10 @@
+from django.http import HttpResponse
+
+from api.common.metrics import registry
+
+
+def metrics(request):
+    """Метрики запросов текущего процесса в формате Prometheus."""
+    return HttpResponse(
+        registry.render(), content_type='text/plain; version=0.0.4'
+    )
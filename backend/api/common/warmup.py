@@ -0,0 +1,59 @@
+"""
+Прогрев процесса до приема запросов (хуки backend/gunicorn.conf.py):
+загрузка маршрутов, построение полей сериализаторов и справочников.
+При preload_app прогрев выполняется в мастер-процессе, и воркеры
+получают результат через fork без копирования памяти.
+"""
+import logging
+import time
+
+from django.core.cache import caches
+from django.db import DatabaseError, connections
+from django.urls import get_resolver
+
+from api.recipes.serializers import (CookableRecipeSerializer,
+                                     IngredientSerializer,
+                                     RecipeReadSerializer,
+                                     RecipeWriteSerializer,
+                                     ShoppingListItemSerializer, TagSerializer)
+from api.recipes.views import IngredientViewSet, TagViewSet
+from api.users.serializers import UserForFollowSerializer, UserSerializer
+
+logger = logging.getLogger(__name__)
+
+SERIALIZERS = (
+    CookableRecipeSerializer, IngredientSerializer, RecipeReadSerializer,
+    RecipeWriteSerializer, ShoppingListItemSerializer, TagSerializer,
+    UserForFollowSerializer, UserSerializer,
+)
+REFERENCE_VIEWSETS = (IngredientViewSet, TagViewSet)
+
+
+def warm_up():
+    """
+    Выполняет работу, которую иначе делает первый запрос в каждом
+    воркере. Ошибки БД не мешают запуску сервера. Соединения с БД
+    и кэшем после прогрева закрываются, чтобы воркеры не унаследовали
+    их от мастер-процесса.
+    """
+    started = time.monotonic()
+    try:
+        resolver = get_resolver()
+        resolver.reverse_dict
+        resolver.resolve('/api/recipes/')
+        for serializer in SERIALIZERS:
+            serializer().fields
+        try:
+            for viewset in REFERENCE_VIEWSETS:
+                viewset(
+                    request=None, format_kwarg=None, action='list'
+                ).get_reference_data()
+        except DatabaseError as error:
+            # БД еще недоступна или без миграций (первый запуск):
+            # справочники загрузит первый запрос.
+            logger.warning('Справочники не прогреты: %s', error)
+    finally:
+        connections.close_all()
+        for cache in caches.all():
+            cache.close()
+    logger.info('Прогрев выполнен за %.2f с.', time.monotonic() - started)
@@ -0,0 +1,76 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.recipes.search import PrefixIndex
+from recipes.models import Ingredient
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает задержку автодополнения ингредиентов на каждое '
+            'нажатие клавиши: фильтр istartswith в БД и PrefixIndex.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--words', type=int, default=50,
+            help='Количество названий, которые "набирает" пользователь.'
+        )
+        parser.add_argument(
+            '--max-length', type=int, default=8,
+            help='Максимальная длина набираемого префикса.'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        names = list(Ingredient.objects.values_list('name', flat=True))
+        if not names:
+            self.stderr.write('В базе данных нет ингредиентов.')
+            return
+        random.seed(options['seed'])
+        words = random.sample(names, min(options['words'], len(names)))
+        keystrokes = [
+            word[:length] for word in words
+            for length in range(1, min(len(word), options['max_length']) + 1)
+        ]
+
+        started = time.perf_counter()
+        items = list(Ingredient.objects.values('id', 'name',
+                                               'measurement_unit'))
+        index = PrefixIndex(items)
+        build_time = time.perf_counter() - started
+
+        results = {
+            'db_istartswith': self.measure(
+                keystrokes,
+                lambda query: list(Ingredient.objects.filter(
+                    name__istartswith=query
+                ).values('id', 'name', 'measurement_unit'))
+            ),
+            'prefix_index': self.measure(keystrokes, index.search),
+        }
+        self.stdout.write(
+            f'Нажатий клавиш: {len(keystrokes)}, ингредиентов: '
+            f'{len(names)}, построение индекса: {build_time * 1000:.2f} мс'
+        )
+        for name, timings in results.items():
+            self.stdout.write(
+                f'{name}: медиана {statistics.median(timings):.3f} мс, '
+                f'p95 {self.percentile(timings, 95):.3f} мс, '
+                f'максимум {max(timings):.3f} мс'
+            )
+
+    @staticmethod
+    def measure(keystrokes, search):
+        timings = []
+        for query in keystrokes:
+            started = time.perf_counter()
+            search(query)
+            timings.append((time.perf_counter() - started) * 1000)
+        return timings
+
+    @staticmethod
+    def percentile(values, percent):
+        values = sorted(values)
+        return values[min(len(values) - 1, len(values) * percent // 100)]
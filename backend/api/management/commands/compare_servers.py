@@ -0,0 +1,201 @@
+import json
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from itertools import cycle
+from urllib.error import URLError
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.authtoken.models import Token
+
+from api.management.commands.run_benchmarks import (Command as Benchmarks,
+                                                    percentile)
+from recipes.models import Recipe
+
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def process_tree(pid):
+    """pid процесса и всех его потомков (по /proc, только Linux)."""
+    children = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as file:
+                parent = int(file.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(parent, []).append(int(entry))
+    tree, stack = [], [pid]
+    while stack:
+        current = stack.pop()
+        tree.append(current)
+        stack.extend(children.get(current, ()))
+    return tree
+
+
+def resident_memory(pid):
+    """Суммарная резидентная память дерева процессов, в байтах."""
+    total = 0
+    for current in process_tree(pid):
+        try:
+            with open(f'/proc/{current}/statm') as file:
+                total += int(file.read().split()[1]) * PAGE_SIZE
+        except (OSError, IndexError, ValueError):
+            continue
+    return total
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает пропускную способность API под gunicorn в режиме '
+            'WSGI (gthread) и ASGI (воркеры uvicorn): запускает оба '
+            'сервера, нагружает эндпоинты чтения и выгрузки списка покупок '
+            'и выводит в формате JSON запросы в секунду, задержку и '
+            'память процессов, а также запросы в секунду на 100 МБ памяти.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--wsgi-workers', type=int, default=2)
+        parser.add_argument('--wsgi-threads', type=int, default=4)
+        parser.add_argument('--asgi-workers', type=int, default=2)
+        parser.add_argument(
+            '--concurrency', type=int, default=16,
+            help='Количество одновременных клиентов.'
+        )
+        parser.add_argument(
+            '--duration', type=float, default=20,
+            help='Длительность нагрузки на каждый сервер, в секундах.'
+        )
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--user', help='Email пользователя для запросов.')
+        parser.add_argument(
+            '--output', help='Файл для результатов (по умолчанию - вывод).'
+        )
+
+    def handle(self, *args, **options):
+        user = Benchmarks.get_user(options['user'])
+        token, _ = Token.objects.get_or_create(user=user)
+        paths = self.paths()
+        servers = {
+            'wsgi': [
+                'foodgram.wsgi', '--worker-class', 'gthread',
+                '--workers', str(options['wsgi_workers']),
+                '--threads', str(options['wsgi_threads']),
+            ],
+            'asgi': [
+                'foodgram.asgi', '--worker-class',
+                'uvicorn.workers.UvicornWorker',
+                '--workers', str(options['asgi_workers']),
+            ],
+        }
+        results = {
+            mode: self.run_server(mode, arguments, paths, token.key, options)
+            for mode, arguments in servers.items()
+        }
+        output = json.dumps({
+            'concurrency': options['concurrency'],
+            'duration': options['duration'],
+            'results': results,
+        }, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output + '\n')
+        else:
+            self.stdout.write(output)
+
+    @staticmethod
+    def paths():
+        """Пути запросов: (путь, нужна ли авторизация)."""
+        recipe_ids = Recipe.objects.order_by('?').values_list(
+            'pk', flat=True
+        )[:20]
+        return [
+            ('/api/tags/', False),
+            ('/api/ingredients/?name=%D0%BC%D0%BE', False),
+            ('/api/recipes/', False),
+            ('/api/recipes/', True),
+            *((f'/api/recipes/{pk}/', True) for pk in recipe_ids),
+            ('/api/recipes/download_shopping_cart/', True),
+        ]
+
+    def run_server(self, mode, arguments, paths, token, options):
+        address = f'127.0.0.1:{options["port"]}'
+        command = [
+            sys.executable, '-m', 'gunicorn', *arguments,
+            '--bind', address, '--log-level', 'warning',
+        ]
+        environment = {**os.environ, 'ASYNC_VIEWS': str(mode == 'asgi')}
+        server = subprocess.Popen(command, env=environment)
+        try:
+            base_url = f'http://{address}'
+            self.wait_ready(base_url, server)
+            self.load(base_url, paths, token, options['concurrency'], 2)
+            result = self.load(
+                base_url, paths, token,
+                options['concurrency'], options['duration']
+            )
+            memory = resident_memory(server.pid) / 2 ** 20
+        finally:
+            server.send_signal(signal.SIGTERM)
+            server.wait(timeout=30)
+        result['rss_mb'] = round(memory, 1)
+        result['rps_per_100mb'] = round(result['rps'] / memory * 100, 1)
+        self.stderr.write(f'{mode}: {result}')
+        return result
+
+    @staticmethod
+    def wait_ready(base_url, server, timeout=30):
+        started = time.monotonic()
+        while time.monotonic() - started < timeout:
+            if server.poll() is not None:
+                raise CommandError('Сервер завершился при запуске.')
+            try:
+                urllib.request.urlopen(f'{base_url}/api/tags/', timeout=1)
+                return
+            except (URLError, OSError):
+                time.sleep(0.2)
+        raise CommandError('Сервер не ответил за отведенное время.')
+
+    @staticmethod
+    def load(base_url, paths, token, concurrency, duration):
+        """Нагружает сервер concurrency клиентами в течение duration."""
+        deadline = time.monotonic() + duration
+
+        def client(offset):
+            timings, errors = [], 0
+            requests = cycle(paths[offset % len(paths):] + paths)
+            while time.monotonic() < deadline:
+                path, authorized = next(requests)
+                request = urllib.request.Request(base_url + path)
+                if authorized:
+                    request.add_header('Authorization', f'Token {token}')
+                started = time.perf_counter()
+                try:
+                    with urllib.request.urlopen(request, timeout=30) as resp:
+                        resp.read()
+                except (URLError, OSError):
+                    errors += 1
+                    continue
+                timings.append((time.perf_counter() - started) * 1000)
+            return timings, errors
+
+        started = time.monotonic()
+        with ThreadPoolExecutor(concurrency) as executor:
+            outcomes = list(executor.map(client, range(concurrency)))
+        elapsed = time.monotonic() - started
+        timings = [value for values, _ in outcomes for value in values]
+        if not timings:
+            raise CommandError('Ни один запрос не выполнен успешно.')
+        return {
+            'requests': len(timings),
+            'errors': sum(errors for _, errors in outcomes),
+            'rps': round(len(timings) / elapsed, 1),
+            'mean_ms': round(statistics.mean(timings), 3),
+            'p50_ms': round(percentile(timings, 50), 3),
+            'p95_ms': round(percentile(timings, 95), 3),
+        }
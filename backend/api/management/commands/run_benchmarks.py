@@ -0,0 +1,197 @@
+import json
+import platform
+import statistics
+import time
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext, setup_test_environment
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, Recipe, Tag
+from users.models import User
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    return values[min(len(values) - 1, len(values) * percent // 100)]
+
+
+class Command(BaseCommand):
+    help = ('Замеряет задержку и количество SQL-запросов основных '
+            'эндпоинтов API тестовым клиентом Django и выводит '
+            'результаты в формате JSON.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations', type=int, default=50,
+            help='Количество замеров каждого эндпоинта.'
+        )
+        parser.add_argument(
+            '--warmup', type=int, default=5,
+            help='Количество запросов до начала замеров.'
+        )
+        parser.add_argument(
+            '--user',
+            help='Email пользователя, от имени которого выполняются '
+                 'запросы (по умолчанию - с наибольшим числом подписок '
+                 'среди пользователей с непустым списком покупок).'
+        )
+        parser.add_argument(
+            '--output', help='Файл для результатов (по умолчанию - вывод).'
+        )
+        parser.add_argument(
+            '--baseline',
+            help='Файл с результатами предыдущего запуска: команда '
+                 'завершается ошибкой, если запросов к БД стало больше.'
+        )
+        parser.add_argument(
+            '--max-slowdown', type=float,
+            help='Допустимый рост медианы задержки относительно baseline '
+                 '(например, 0.5 - на 50%%).'
+        )
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        user = self.get_user(options['user'])
+        token, _ = Token.objects.get_or_create(user=user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        results = {
+            name: self.measure(client, paths, options)
+            for name, paths in self.scenarios().items()
+        }
+        report = {
+            'environment': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'iterations': options['iterations'],
+            },
+            'dataset': {
+                'users': User.objects.count(),
+                'recipes': Recipe.objects.count(),
+                'ingredients': Ingredient.objects.count(),
+            },
+            'results': results,
+        }
+        output = json.dumps(report, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output + '\n')
+        else:
+            self.stdout.write(output)
+        if options['baseline']:
+            self.compare(results, options['baseline'],
+                         options['max_slowdown'])
+
+    @staticmethod
+    def get_user(email):
+        if email:
+            user = User.objects.filter(email=email).first()
+        else:
+            user = User.objects.annotate(
+                follows=Count('subscriptions', distinct=True),
+                carts=Count('shopping_cart', distinct=True)
+            ).filter(carts__gt=0).order_by('-follows', 'pk').first()
+        if user is None:
+            raise CommandError(
+                'Нет пользователя для замеров, создайте данные командой '
+                'generate_load_data.'
+            )
+        return user
+
+    @staticmethod
+    def scenarios():
+        """Эндпоинты для замеров: имя - список путей по очереди."""
+        recipe_ids = list(Recipe.objects.order_by('?').values_list(
+            'pk', flat=True
+        )[:20])
+        tags = list(Tag.objects.values_list('slug', flat=True)[:2])
+        names = Ingredient.objects.order_by('?').values_list(
+            'name', flat=True
+        )[:20]
+        tag_query = '&'.join(f'tags={slug}' for slug in tags)
+        return {
+            'recipe_list': ['/api/recipes/'],
+            'recipe_list_tags': [f'/api/recipes/?{tag_query}'],
+            'recipe_list_favorited': ['/api/recipes/?is_favorited=1'],
+            'recipe_list_cursor': ['/api/recipes/?pagination=cursor'],
+            'recipe_list_trending': ['/api/recipes/?ordering=trending'],
+            'recipe_detail': [
+                f'/api/recipes/{recipe_id}/' for recipe_id in recipe_ids
+            ],
+            'subscriptions': ['/api/users/subscriptions/?recipes_limit=3'],
+            'ingredient_search': [
+                f'/api/ingredients/?name={name[:3]}' for name in names
+            ],
+            'shopping_cart_download': [
+                '/api/recipes/download_shopping_cart/'
+            ],
+        }
+
+    @staticmethod
+    def request(client, path):
+        response = client.get(path)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        return response
+
+    def measure(self, client, paths, options):
+        for number in range(options['warmup']):
+            self.request(client, paths[number % len(paths)])
+        timings, queries, statuses = [], [], set()
+        for number in range(options['iterations']):
+            path = paths[number % len(paths)]
+            with CaptureQueriesContext(connection) as context:
+                started = time.perf_counter()
+                response = self.request(client, path)
+                timings.append((time.perf_counter() - started) * 1000)
+            queries.append(len(context.captured_queries))
+            statuses.add(response.status_code)
+        result = {
+            'status': sorted(statuses),
+            'queries': max(queries),
+            'mean_ms': round(statistics.mean(timings), 3),
+            'max_ms': round(max(timings), 3),
+        }
+        for percent in PERCENTILES:
+            result[f'p{percent}_ms'] = round(percentile(timings, percent), 3)
+        return result
+
+    def compare(self, results, path, max_slowdown):
+        with open(path, encoding='utf-8') as file:
+            baseline = json.load(file)['results']
+        regressions = []
+        for name, result in results.items():
+            expected = baseline.get(name)
+            if expected is None:
+                continue
+            if result['status'] != expected['status']:
+                regressions.append(
+                    f'{name}: статус ответа {result["status"]} '
+                    f'вместо {expected["status"]}'
+                )
+            if result['queries'] > expected['queries']:
+                regressions.append(
+                    f'{name}: запросов {result["queries"]} '
+                    f'вместо {expected["queries"]}'
+                )
+            if max_slowdown is not None and result['p50_ms'] > (
+                    expected['p50_ms'] * (1 + max_slowdown)):
+                regressions.append(
+                    f'{name}: медиана {result["p50_ms"]} мс '
+                    f'вместо {expected["p50_ms"]} мс'
+                )
+        if regressions:
+            raise CommandError(
+                'Регрессия производительности:\n' + '\n'.join(regressions)
+            )
+        self.stderr.write(self.style.SUCCESS(
+            'Регрессий относительно baseline нет.'
+        ))
@@ -0,0 +1,126 @@
+import csv
+import datetime
+import json
+
+
+class Echo:
+    """Объект-заглушка файла: write возвращает строку, а не пишет ее."""
+
+    def write(self, value):
+        return value
+
+
+class ShoppingCartExporter:
+    """
+    Базовый класс потоковой выгрузки списка покупок.
+
+    Строки формируются по мере чтения агрегированного queryset
+    ингредиентов, поэтому файл не собирается в памяти целиком.
+    """
+
+    extension = None
+    content_type = None
+
+    def __init__(self, user, ingredients):
+        self.user = user
+        self.ingredients = ingredients
+        self.today = datetime.datetime.today()
+
+    @property
+    def filename(self):
+        return f'Shopping_cart_for_{self.user.username}.{self.extension}'
+
+    def header(self):
+        return ''
+
+    def row(self, ingredient):
+        raise NotImplementedError
+
+    def footer(self):
+        return ''
+
+    def __iter__(self):
+        yield self.header()
+        for ingredient in self.ingredients.iterator():
+            yield self.row(ingredient)
+        yield self.footer()
+
+
+class TxtExporter(ShoppingCartExporter):
+    """Выгрузка списка покупок в текстовом формате."""
+
+    extension = 'txt'
+    content_type = 'text/plain; charset=utf-8'
+
+    def header(self):
+        return (
+            f'Список покупок для {self.user.get_full_name()}\n'
+            f'От {self.today:%d.%m.%Y}\n\n'
+        )
+
+    def row(self, ingredient):
+        return (
+            f'{ingredient["ingredient__name"]} - {ingredient["amount"]} '
+            f'{ingredient["ingredient__measurement_unit"]}\n'
+        )
+
+    def footer(self):
+        return '\nFoodgram - Ваш Продуктовый помощник.'
+
+
+class CsvExporter(ShoppingCartExporter):
+    """Выгрузка списка покупок в формате CSV."""
+
+    extension = 'csv'
+    content_type = 'text/csv; charset=utf-8'
+
+    def __init__(self, user, ingredients):
+        super().__init__(user, ingredients)
+        self.writer = csv.writer(Echo())
+
+    def header(self):
+        return self.writer.writerow(('name', 'amount', 'measurement_unit'))
+
+    def row(self, ingredient):
+        return self.writer.writerow((
+            ingredient['ingredient__name'],
+            ingredient['amount'],
+            ingredient['ingredient__measurement_unit'],
+        ))
+
+
+class JsonExporter(ShoppingCartExporter):
+    """Выгрузка списка покупок в формате JSON."""
+
+    extension = 'json'
+    content_type = 'application/json; charset=utf-8'
+
+    def header(self):
+        return (
+            '{"user": ' + json.dumps(self.user.username, ensure_ascii=False)
+            + f', "date": "{self.today:%Y-%m-%d}", "ingredients": ['
+        )
+
+    def __iter__(self):
+        yield self.header()
+        separator = ''
+        for ingredient in self.ingredients.iterator():
+            yield separator + self.row(ingredient)
+            separator = ', '
+        yield self.footer()
+
+    def row(self, ingredient):
+        return json.dumps({
+            'name': ingredient['ingredient__name'],
+            'amount': ingredient['amount'],
+            'measurement_unit': ingredient['ingredient__measurement_unit'],
+        }, ensure_ascii=False)
+
+    def footer(self):
+        return ']}'
+
+
+EXPORTERS = {
+    exporter.extension: exporter
+    for exporter in (TxtExporter, CsvExporter, JsonExporter)
+}
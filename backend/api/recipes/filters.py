@@ -1,45 +1,91 @@
+from django.db.models import Exists, OuterRef
 from django_filters import FilterSet
 from django_filters.rest_framework import filters
 
-from recipes.models import Ingredient, Recipe, Tag
+from recipes.models import Recipe, Tag
+from recipes.search import search_recipes
 
+TAGS_MATCH_ANY = 'any'
+TAGS_MATCH_ALL = 'all'
 
-class IngredientFilter(FilterSet):
-    """Кастомный фильтр объектов Ingredient для поиска по названию."""
-
-    name = filters.CharFilter(lookup_expr='istartswith')
-
-    class Meta:
-        model = Ingredient
-        fields = ('name',)
+# Поля сортировки для параметра ordering, последнее поле уникально.
+ORDERINGS = {
+    'popular': ('-favorites_count', '-id'),
+    'trending': ('-trending_score', '-id'),
+}
 
 
 class RecipeFilter(FilterSet):
     """
     Кастомный фильтр объектов Recipe для поиска по тегам, автору,
-    избранному и списку покупок.
+    избранному, списку покупок, тексту (search) и времени
+    приготовления (max_cooking_time). Параметр ordering сортирует
+    рецепты по популярности (popular) или рейтингу трендов (trending).
+
+    Теги проверяются подзапросом EXISTS, поэтому рецепты не дублируются
+    при выборе нескольких тегов. Параметр tags_match задает режим:
+    any - хотя бы один из тегов, all - все выбранные теги.
     """
 
     tags = filters.ModelMultipleChoiceFilter(
         field_name='tags__slug',
         to_field_name='slug',
         queryset=Tag.objects.all(),
+        method='filter_tags'
+    )
+    tags_match = filters.ChoiceFilter(
+        choices=((TAGS_MATCH_ANY, 'Любой из тегов'),
+                 (TAGS_MATCH_ALL, 'Все теги')),
+        method='filter_tags_match'
     )
     is_favorited = filters.BooleanFilter(method='filter_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_is_in_shopping_cart'
     )
+    search = filters.CharFilter(method='filter_search')
+    max_cooking_time = filters.NumberFilter(
+        field_name='cooking_time', lookup_expr='lte'
+    )
+    ordering = filters.ChoiceFilter(
+        choices=(('popular', 'Популярные'), ('trending', 'В тренде')),
+        method='filter_ordering'
+    )
 
     class Meta:
         model = Recipe
         fields = ('tags', 'author')
 
+    @staticmethod
+    def recipe_tags(**kwargs):
+        return Recipe.tags.through.objects.filter(
+            recipe=OuterRef('pk'), **kwargs
+        )
+
+    def filter_tags(self, queryset, name, value):
+        if not value:
+            return queryset
+        if self.form.cleaned_data.get('tags_match') == TAGS_MATCH_ALL:
+            for tag in value:
+                queryset = queryset.filter(Exists(self.recipe_tags(tag=tag)))
+            return queryset
+        return queryset.filter(Exists(self.recipe_tags(tag__in=value)))
+
+    def filter_tags_match(self, queryset, name, value):
+        """Режим применяется в filter_tags."""
+        return queryset
+
     def filter_is_favorited(self, queryset, name, value):
         if value and self.request.user.is_authenticated:
-            return queryset.filter(favorites__user=self.request.user)
+            return queryset.filter(is_favorited=True)
         return queryset
 
     def filter_is_in_shopping_cart(self, queryset, name, value):
         if value and self.request.user.is_authenticated:
-            return queryset.filter(shopping_cart__user=self.request.user)
+            return queryset.filter(is_in_shopping_cart=True)
         return queryset
+
+    def filter_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
+
+    def filter_ordering(self, queryset, name, value):
+        return queryset.order_by(*ORDERINGS[value])
@@ -0,0 +1,46 @@
+from bisect import bisect_left
+
+
+class PrefixIndex:
+    """
+    Индекс для автодополнения по названию.
+
+    Хранит отсортированные названия в нижнем регистре: совпадения по
+    началу находятся бинарным поиском, совпадения внутри названия -
+    одним проходом по списку без обращений к БД.
+    """
+
+    def __init__(self, items, field='name'):
+        entries = sorted(
+            (item[field].lower(), position)
+            for position, item in enumerate(items)
+        )
+        self.items = items
+        self.keys = [key for key, _ in entries]
+        self.positions = [position for _, position in entries]
+
+    def prefix_range(self, query):
+        """Границы отрезка названий, начинающихся с query."""
+        start = end = bisect_left(self.keys, query)
+        while end < len(self.keys) and self.keys[end].startswith(query):
+            end += 1
+        return start, end
+
+    def search(self, query):
+        """
+        Возвращает сначала элементы, название которых начинается с query,
+        затем элементы, содержащие query внутри названия: чем ближе
+        совпадение к началу, тем выше элемент.
+        """
+        query = query.strip().lower()
+        if not query:
+            return list(self.items)
+        start, end = self.prefix_range(query)
+        found = self.positions[start:end]
+        substring_matches = sorted(
+            (key.find(query), index)
+            for index, key in enumerate(self.keys)
+            if (index < start or index >= end) and query in key
+        )
+        found.extend(self.positions[index] for _, index in substring_matches)
+        return [self.items[position] for position in found]
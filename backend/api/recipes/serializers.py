@@ -1,16 +1,20 @@
+from django.conf import settings
 from django.db import transaction
-from django.db.models import F
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 from rest_framework.validators import UniqueTogetherValidator
 
-from api.common.serializers import Base64ImageField, RecipeShortSerializer
+from api.common.serializers import (Base64ImageField, RecipeShortSerializer,
+                                    TimedSerializerMixin)
 from api.users.serializers import UserSerializer
-from recipes.models import (Favorite, Ingredient, Recipe,
-                            RecipeIngredientsRelated, ShoppingCart, Tag)
+from recipes.images import ORIGINAL
+from recipes.models import (Favorite, ImageJob, Ingredient, Recipe,
+                            RecipeIngredientsRelated, ShoppingCart,
+                            ShoppingListItem, Tag)
+from recipes.search import update_search_vector
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Сериализатор объектов Tag."""
 
     class Meta:
@@ -19,7 +23,7 @@ class TagSerializer(serializers.ModelSerializer):
         read_only_fields = ('name', 'color', 'slug')
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Сериализатор объектов Ingredient."""
 
     class Meta:
@@ -41,41 +45,65 @@ class IngredientForRecipeWriteSerializer(serializers.ModelSerializer):
         fields = ('id', 'amount')
 
 
-class BaseRecipeSerializer(serializers.ModelSerializer):
+class IngredientForRecipeReadSerializer(serializers.ModelSerializer):
+    """
+    Сериализатор промежуточной таблицы Recipe и Ingredient
+    для чтения ингредиентов рецепта и их количества.
+    """
+
+    id = serializers.ReadOnlyField(source='ingredient.id')
+    name = serializers.ReadOnlyField(source='ingredient.name')
+    measurement_unit = serializers.ReadOnlyField(
+        source='ingredient.measurement_unit'
+    )
+
+    class Meta:
+        model = RecipeIngredientsRelated
+        fields = ('id', 'name', 'measurement_unit', 'amount')
+
+
+class BaseRecipeSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Базовый сериализатор для объектов Recipe."""
 
     class Meta:
         model = Recipe
-        exclude = ('pub_date',)
+        exclude = (
+            'pub_date', 'favorites_count', 'cart_count', 'image_hash',
+            'search_vector', 'trending_score'
+        )
 
 
 class RecipeReadSerializer(BaseRecipeSerializer):
     """Сериализатор только для чтения объектов Recipe."""
 
     image = serializers.SerializerMethodField()
+    images = serializers.SerializerMethodField()
     tags = TagSerializer(many=True)
-    ingredients = serializers.SerializerMethodField()
+    ingredients = IngredientForRecipeReadSerializer(
+        source='ingredients_list', many=True
+    )
     author = UserSerializer()
     is_favorited = serializers.BooleanField(default=False)
     is_in_shopping_cart = serializers.BooleanField(default=False)
 
     def get_image(self, obj):
-        if obj.image:
-            return obj.image.url
-        return None
-
-    def get_ingredients(self, obj):
-        ingredients = obj.ingredients.values(
-            'id',
-            'name',
-            'measurement_unit',
-            amount=F('recipes__amount')
-        )
-        return ingredients
+        return obj.get_image_url('detail')
+
+    def get_images(self, obj):
+        return {
+            rendition: obj.get_image_url(rendition)
+            for rendition in (ORIGINAL, *settings.RECIPE_IMAGE_RENDITIONS)
+        }
 
 
 class RecipeWriteSerializer(BaseRecipeSerializer):
-    """Сериализатор для записи/изменения объектов Recipe."""
+    """
+    Сериализатор для записи/изменения объектов Recipe.
+
+    Изображение передается строкой base64 (JSON) или файлом
+    (multipart/form-data). В multipart-запросе ингредиенты передаются
+    полями ingredients[0]id, ingredients[0]amount и т.д.
+    """
 
     image = Base64ImageField()
     tags = serializers.PrimaryKeyRelatedField(
@@ -86,19 +114,19 @@ class RecipeWriteSerializer(BaseRecipeSerializer):
     author = serializers.HiddenField(default=serializers.CurrentUserDefault())
 
     def validate(self, attrs):
-        ingredients = self.initial_data.get('ingredients')
-        tags = self.initial_data.get('tags')
+        ingredients = attrs.get('ingredients')
+        tags = attrs.get('tags')
         if not ingredients:
             raise ValidationError('Выберите хотя бы один ингредиент.')
         if not tags:
             raise ValidationError('Выберите хотя бы один тег.')
         ingredients_list = []
         for item in ingredients:
-            if item.get('id') in ingredients_list:
+            if item['id'] in ingredients_list:
                 raise ValidationError(
                     'Ингредиенты не должны быть повторяться.'
                 )
-            ingredients_list.append(item.get('id'))
+            ingredients_list.append(item['id'])
         unique_tags = set(tags)
         if len(unique_tags) != len(tags):
             raise ValidationError('Выбранные теги не должны повторяться.')
@@ -119,19 +147,68 @@ class RecipeWriteSerializer(BaseRecipeSerializer):
     def create(self, validated_data):
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
+        image = validated_data.pop('image')
         recipe = Recipe.objects.create(**validated_data)
         recipe.tags.set(tags)
         self.save_ingredients_relations(recipe, ingredients)
+        update_search_vector(recipe.pk)
+        ImageJob.objects.enqueue(recipe, image.file, image.encoding)
         return recipe
 
+    @staticmethod
+    def update_ingredients_relations(recipe, ingredients):
+        """
+        Приводит ингредиенты рецепта к списку ingredients: изменяет только
+        отличающиеся количества, добавляет новые и удаляет убранные строки.
+        Возвращает изменения количеств {id ингредиента: разница}.
+        """
+        current = {
+            item.ingredient_id: item
+            for item in RecipeIngredientsRelated.objects.select_for_update(
+            ).filter(recipe=recipe)
+        }
+        changes, to_create, to_update = {}, [], []
+        for item in ingredients:
+            ingredient_id, amount = item['id'].id, item['amount']
+            relation = current.pop(ingredient_id, None)
+            if relation is None:
+                to_create.append(RecipeIngredientsRelated(
+                    recipe=recipe, ingredient_id=ingredient_id, amount=amount
+                ))
+                changes[ingredient_id] = amount
+            elif relation.amount != amount:
+                changes[ingredient_id] = amount - relation.amount
+                relation.amount = amount
+                to_update.append(relation)
+        for ingredient_id, relation in current.items():
+            changes[ingredient_id] = -relation.amount
+        if current:
+            RecipeIngredientsRelated.objects.filter(
+                pk__in=[relation.pk for relation in current.values()]
+            ).delete()
+        RecipeIngredientsRelated.objects.bulk_update(to_update, ('amount',))
+        RecipeIngredientsRelated.objects.bulk_create(to_create)
+        return changes
+
     @transaction.atomic
     def update(self, instance, validated_data):
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
-        instance.tags.set(tags)
-        instance.ingredients.clear()
-        self.save_ingredients_relations(instance, ingredients)
-        return super().update(instance, validated_data)
+        if set(instance.tags.values_list('id', flat=True)) != {
+                tag.id for tag in tags}:
+            instance.tags.set(tags)
+        changes = self.update_ingredients_relations(instance, ingredients)
+        ShoppingListItem.objects.apply_recipe_delta(instance, changes)
+        image = validated_data.pop('image', None)
+        for field, value in validated_data.items():
+            setattr(instance, field, value)
+        instance.save(
+            update_fields=instance.fields_for_update(*Recipe.image_fields)
+        )
+        update_search_vector(instance.pk)
+        if image is not None:
+            ImageJob.objects.enqueue(instance, image.file, image.encoding)
+        return instance
 
     def to_representation(self, instance):
         return RecipeReadSerializer(instance, context=self.context).data
@@ -170,3 +247,49 @@ class ShoppingCartSerializer(FavoriteSerializer):
                 message='Рецепт уже добавлен в список покупок!'
             )
         ]
+
+
+class ShoppingListItemSerializer(TimedSerializerMixin,
+                                 serializers.ModelSerializer):
+    """Сериализатор суммарного списка покупок пользователя."""
+
+    id = serializers.ReadOnlyField(source='ingredient.id')
+    name = serializers.ReadOnlyField(source='ingredient.name')
+    measurement_unit = serializers.ReadOnlyField(
+        source='ingredient.measurement_unit'
+    )
+    amount = serializers.ReadOnlyField(source='total_amount')
+
+    class Meta:
+        model = ShoppingListItem
+        fields = ('id', 'name', 'measurement_unit', 'amount')
+
+
+class CookableQuerySerializer(serializers.Serializer):
+    """Сериализатор параметров поиска рецептов по ингредиентам."""
+
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=100
+    )
+    min_coverage = serializers.FloatField(
+        min_value=0, max_value=1, default=0
+    )
+
+
+class CookableRecipeSerializer(RecipeReadSerializer):
+    """
+    Сериализатор рецептов, найденных по ингредиентам: доля покрытия
+    и id недостающих ингредиентов.
+    """
+
+    coverage = serializers.FloatField(read_only=True)
+    missing_ingredients = serializers.SerializerMethodField()
+
+    def get_missing_ingredients(self, obj):
+        available = self.context['ingredients']
+        return [
+            item.ingredient_id for item in obj.ingredients_list.all()
+            if item.ingredient_id not in available
+        ]
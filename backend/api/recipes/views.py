@@ -1,7 +1,5 @@
-import datetime
-
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.db.models import F
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import status
@@ -10,52 +8,87 @@ from rest_framework.permissions import AllowAny, IsAuthenticated, SAFE_METHODS
 from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
 
-from api.common.paginators import PagePagination
-from api.recipes.filters import IngredientFilter, RecipeFilter
+from api.common.mixins import AnonymousResponseCacheMixin, ReferenceDataMixin
+from api.common.paginators import (FeedPagination, HybridPagination,
+                                   KeysetPagination, PagePagination)
+from api.recipes.exporters import EXPORTERS
+from api.recipes.filters import ORDERINGS, RecipeFilter
 from api.recipes.permissions import IsOwnerOrReadOnly
-from api.recipes.serializers import (FavoriteSerializer, IngredientSerializer,
+from api.recipes.search import PrefixIndex
+from api.recipes.serializers import (CookableQuerySerializer,
+                                     CookableRecipeSerializer,
+                                     FavoriteSerializer, IngredientSerializer,
                                      RecipeReadSerializer,
                                      RecipeWriteSerializer,
-                                     ShoppingCartSerializer, TagSerializer)
-from recipes.models import (Favorite, Ingredient, Recipe,
-                            RecipeIngredientsRelated, Tag, ShoppingCart)
+                                     ShoppingCartSerializer,
+                                     ShoppingListItemSerializer, TagSerializer)
+from recipes.cache import (ingredients_cache, recipes_response_cache,
+                           tags_cache)
+from recipes.feed import feed_recipes
+from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
+from recipes.search import cookable_recipes
 
 
-class TagViewSet(ReadOnlyModelViewSet):
+class TagViewSet(ReferenceDataMixin, ReadOnlyModelViewSet):
     """Вьюсет для работы с объектами Tag."""
 
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (AllowAny,)
+    reference_cache = tags_cache
 
 
-class IngredientViewSet(ReadOnlyModelViewSet):
-    """Вьюсет для работы с объектами Ingredient."""
+class IngredientViewSet(ReferenceDataMixin, ReadOnlyModelViewSet):
+    """
+    Вьюсет для работы с объектами Ingredient.
+    Поддерживает автодополнение по названию через параметр name.
+    """
 
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (AllowAny,)
-    filter_backends = (DjangoFilterBackend,)
-    filterset_class = IngredientFilter
+    reference_cache = ingredients_cache
 
+    def filter_reference_items(self, reference):
+        name = self.request.query_params.get('name')
+        if not name:
+            return reference.items
+        return reference.derived('name_index', PrefixIndex).search(name)
 
-class RecipeViewSet(ModelViewSet):
-    """Вьюсет для работы с объектами Recipe."""
+
+class RecipeViewSet(AnonymousResponseCacheMixin, ModelViewSet):
+    """
+    Вьюсет для работы с объектами Recipe.
+    Поддерживает пагинацию page/limit и по курсору (pagination=cursor).
+    Списки и рецепты для анонимных пользователей отдаются из кэша.
+    """
 
     permission_classes = (IsOwnerOrReadOnly,)
-    pagination_class = PagePagination
+    response_cache = recipes_response_cache
+    response_cache_params = (
+        'page', 'limit', 'cursor', 'pagination', 'tags', 'tags_match',
+        'author', 'is_favorited', 'is_in_shopping_cart', 'search',
+        'max_cooking_time', 'ordering',
+    )
+    pagination_class = HybridPagination
     http_method_names = ('get', 'post', 'patch', 'delete')
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
 
+    @property
+    def keyset_ordering(self):
+        """Порядок для пагинации по курсору с учетом параметра ordering."""
+        return ORDERINGS.get(
+            self.request.query_params.get('ordering'),
+            KeysetPagination.ordering
+        )
+
     def get_queryset(self):
         """
-        Если пользователь авторизован, вычисляет дополнительные параметры:
-        is_favorited и is_in_shopping_cart.
+        Вычисляет дополнительные параметры is_favorited и
+        is_in_shopping_cart и подгружает связанные объекты рецептов.
         """
-        if self.request.user.is_authenticated:
-            return Recipe.objects.custom_annotate(self.request.user)
-        return Recipe.objects.all()
+        return Recipe.objects.custom_annotate(self.request.user)
 
     def get_serializer_class(self):
         """Возвращает сериализатор в зависимости от метода запроса."""
@@ -113,25 +146,14 @@ class RecipeViewSet(ModelViewSet):
         return self.add_recipe(ShoppingCartSerializer, pk, self.request)
 
     @staticmethod
-    def create_file_shopping_cart(user, ingredients):
-        """Создает файл со списком ингредиентов для пользователя."""
-        today = datetime.datetime.today()
-        shopping_cart = (
-            f'Список покупок для {user.get_full_name()}\n'
-            f'От {today:%d.%m.%Y}\n\n'
+    def create_file_shopping_cart(exporter):
+        """Потоково отдает файл со списком ингредиентов для пользователя."""
+        response = StreamingHttpResponse(
+            exporter, content_type=exporter.content_type
         )
-        for ingredient in ingredients:
-            shopping_cart += (
-                f'{ingredient["ingredient__name"]} - {ingredient["amount"]} '
-                f'{ingredient["ingredient__measurement_unit"]}\n'
-            )
-        shopping_cart += '\nFoodgram - Ваш Продуктовый помощник.'
-        file = f'Shopping_cart_for_{user.username}.txt'
-        response = HttpResponse(
-            shopping_cart,
-            content_type='text.txt; charset=utf-8'
+        response['Content-Disposition'] = (
+            f'attachment; filename={exporter.filename}'
         )
-        response['Content-Disposition'] = f'attachment; filename={file}'
         return response
 
     @action(
@@ -141,14 +163,81 @@ class RecipeViewSet(ModelViewSet):
         permission_classes=(IsAuthenticated,)
     )
     def get_file_shopping_cart(self, request):
-        """Формирует и отправляет файл с ингредиентами объекта Recipe."""
+        """
+        Формирует и отправляет файл с ингредиентами объекта Recipe.
+        Формат файла задается параметром filetype: txt, csv или json.
+        """
         user = request.user
+        filetype = request.query_params.get('filetype', 'txt')
+        if filetype not in EXPORTERS:
+            return Response(
+                {'errors': [f'Доступные форматы: {", ".join(EXPORTERS)}.']},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         if not user.shopping_cart.exists():
             return Response(status=status.HTTP_400_BAD_REQUEST)
-        ingredients = RecipeIngredientsRelated.objects.filter(
-            recipe__shopping_cart__user=user
-        ).values(
+        ingredients = user.shopping_list.values(
             'ingredient__name',
-            'ingredient__measurement_unit'
-        ).order_by('ingredient__name').annotate(amount=Sum('amount'))
-        return self.create_file_shopping_cart(user, ingredients)
+            'ingredient__measurement_unit',
+            amount=F('total_amount')
+        ).order_by('ingredient__name')
+        return self.create_file_shopping_cart(
+            EXPORTERS[filetype](user, ingredients)
+        )
+
+    @action(
+        methods=('get',),
+        detail=False,
+        url_path='shopping_list',
+        permission_classes=(IsAuthenticated,)
+    )
+    def get_shopping_list(self, request):
+        """Возвращает суммарный список ингредиентов из списка покупок."""
+        items = request.user.shopping_list.select_related(
+            'ingredient'
+        ).order_by('ingredient__name')
+        serializer = ShoppingListItemSerializer(items, many=True)
+        return Response(serializer.data)
+
+    @action(methods=('get',), detail=False, url_path='cookable')
+    def get_cookable(self, request):
+        """
+        Возвращает рецепты, которые можно приготовить из ингредиентов
+        ingredients, по убыванию доли покрытия. Параметр min_coverage
+        отсекает рецепты с меньшей долей, остальные фильтры рецептов
+        (tags, max_cooking_time и т.д.) также применяются.
+        """
+        params = CookableQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        ingredients = set(params.validated_data['ingredients'])
+        queryset = cookable_recipes(
+            self.filter_queryset(self.get_queryset()), ingredients
+        ).filter(coverage__gte=params.validated_data['min_coverage'])
+        paginator = PagePagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = CookableRecipeSerializer(
+            page,
+            many=True,
+            context={**self.get_serializer_context(),
+                     'ingredients': ingredients}
+        )
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(
+        methods=('get',),
+        detail=False,
+        url_path='feed',
+        permission_classes=(IsAuthenticated,)
+    )
+    def get_feed(self, request):
+        """
+        Возвращает рецепты авторов, на которых подписан пользователь,
+        от новых к старым. Пагинация только по курсору (cursor, limit).
+        """
+        queryset = feed_recipes(self.get_queryset(), request.user)
+        paginator = FeedPagination()
+        page = paginator.paginate_queryset(queryset, request)
+        serializer = RecipeReadSerializer(
+            page, many=True, context=self.get_serializer_context()
+        )
+        return paginator.get_paginated_response(serializer.data)
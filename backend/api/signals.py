@@ -0,0 +1,46 @@
+from django.contrib.auth import get_user_model
+from django.core.signals import request_finished, request_started
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from api.common.authentication import token_cache
+from api.common.connections import (check_connections,
+                                    mark_connections_used)
+from api.common.metrics import registry
+
+User = get_user_model()
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    """Сбрасывает кэш при выходе пользователя (token/logout)."""
+    token_cache.delete(instance.key)
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_tokens(sender, instance, created, **kwargs):
+    """
+    Сбрасывает кэш токенов пользователя при любом изменении, в том числе
+    при смене пароля и деактивации.
+    """
+    if not created:
+        token_cache.delete(*Token.objects.filter(
+            user=instance
+        ).values_list('key', flat=True))
+
+
+@receiver(request_started)
+def check_db_connections(sender, **kwargs):
+    check_connections()
+
+
+@receiver(request_finished)
+def mark_db_connections_used(sender, **kwargs):
+    mark_connections_used()
+
+
+@receiver(connection_created)
+def count_db_connection(sender, connection, **kwargs):
+    registry.count_connection(connection.alias, 'opened')
@@ -0,0 +1,95 @@
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import User
+
+
+class CounterTests(APITestCase):
+    """Счетчики избранного, корзин и рецептов автора."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email='author@example.com', username='author',
+            first_name='Автор', last_name='Рецептов', password='password-1'
+        )
+        cls.readers = [
+            User.objects.create_user(
+                email=f'reader{number}@example.com',
+                username=f'reader{number}', first_name='Читатель',
+                last_name=str(number), password='password-1'
+            )
+            for number in range(2)
+        ]
+        cls.recipe = cls.create_recipe()
+
+    @classmethod
+    def create_recipe(cls):
+        return Recipe.objects.create(
+            author=cls.author, name='Рецепт', text='Описание',
+            cooking_time=10, image='recipes/images/recipe.png'
+        )
+
+    def counter(self, field):
+        return Recipe.objects.values_list(field, flat=True).get(
+            pk=self.recipe.pk
+        )
+
+    def check_counter(self, action, field):
+        path = f'/api/recipes/{self.recipe.pk}/{action}/'
+        for reader in self.readers:
+            self.client.force_authenticate(reader)
+            response = self.client.post(path)
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.counter(field), 2)
+        response = self.client.delete(path)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.counter(field), 1)
+        response = self.client.delete(path)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.counter(field), 1)
+
+    def test_favorite_counter(self):
+        self.check_counter('favorite', 'favorites_count')
+        self.assertEqual(self.counter('cart_count'), 0)
+
+    def test_shopping_cart_counter(self):
+        self.check_counter('shopping_cart', 'cart_count')
+        self.assertEqual(self.counter('favorites_count'), 0)
+
+    def test_author_recipes_counter(self):
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.recipes_count, 1)
+        recipe = self.create_recipe()
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.recipes_count, 2)
+        recipe.delete()
+        self.recipe.delete()
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.recipes_count, 0)
+
+    def test_counter_is_not_negative(self):
+        Favorite.objects.create(user=self.readers[0], recipe=self.recipe)
+        Recipe.objects.filter(pk=self.recipe.pk).update(favorites_count=0)
+        Favorite.objects.all().delete()
+        self.assertEqual(self.counter('favorites_count'), 0)
+
+    def test_full_save_keeps_counters(self):
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        author = User.objects.get(pk=self.author.pk)
+        Favorite.objects.create(user=self.readers[0], recipe=self.recipe)
+        ShoppingCart.objects.create(user=self.readers[0], recipe=self.recipe)
+        self.create_recipe()
+        recipe.name = 'Новое название'
+        recipe.save()
+        author.set_password('password-2')
+        author.save()
+        self.assertEqual(self.counter('favorites_count'), 1)
+        self.assertEqual(self.counter('cart_count'), 1)
+        self.assertEqual(
+            Recipe.objects.get(pk=self.recipe.pk).name, 'Новое название'
+        )
+        author.refresh_from_db()
+        self.assertEqual(author.recipes_count, 2)
+        self.assertTrue(author.check_password('password-2'))
@@ -0,0 +1,193 @@
+import base64
+import shutil
+import tempfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import override_settings
+from django.utils import timezone
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APIRequestFactory, APITestCase
+
+from api.recipes.serializers import RecipeWriteSerializer
+from recipes.images import RENDITIONS_PATH
+from recipes.management.commands.process_image_jobs import run_image_job
+from recipes.models import (ImageJob, ImageStatus, Ingredient, Recipe,
+                            RecipeIngredientsRelated, Tag)
+from users.models import User
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def image_data_uri():
+    buffer = BytesIO()
+    Image.new('RGB', (8, 8), 'red').save(buffer, 'PNG')
+    return 'data:image/png;base64,' + base64.b64encode(
+        buffer.getvalue()
+    ).decode()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ImageJobTests(APITestCase):
+    """Жизненный цикл задач фоновой обработки изображений."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email='author@example.com', username='author',
+            first_name='Автор', last_name='Рецептов', password='password-1'
+        )
+        cls.tag = Tag.objects.create(name='Тег', color='#000000', slug='tag')
+        cls.ingredient = Ingredient.objects.create(
+            name='Ингредиент', measurement_unit='г'
+        )
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name='Рецепт', text='Описание',
+            cooking_time=10, image='recipes/images/recipe.png',
+            image_status=ImageStatus.READY
+        )
+        cls.recipe.tags.set((cls.tag,))
+        RecipeIngredientsRelated.objects.create(
+            recipe=cls.recipe, ingredient=cls.ingredient, amount=10
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def recipe_data(self, **data):
+        return {
+            'name': 'Рецепт',
+            'text': 'Описание',
+            'cooking_time': 10,
+            'tags': [self.tag.pk],
+            'ingredients': [{'id': self.ingredient.pk, 'amount': 10}],
+            **data,
+        }
+
+    def enqueue(self, content=b'not an image'):
+        return ImageJob.objects.enqueue(
+            self.recipe, ContentFile(content, name='upload.png'),
+            ImageJob.Encoding.BINARY
+        )
+
+    def process_jobs(self):
+        # Воркер закрывает соединение между задачами, а тест выполняется
+        # внутри транзакции, которую закрывать нельзя.
+        with mock.patch(
+            'recipes.management.commands.process_image_jobs'
+            '.close_old_connections'
+        ), self.captureOnCommitCallbacks(execute=True):
+            call_command('process_image_jobs', '--once', stdout=StringIO())
+
+    def make_stale(self, job):
+        ImageJob.objects.filter(pk=job.pk).update(
+            updated=timezone.now() - timedelta(
+                seconds=settings.IMAGE_JOB_TIMEOUT + 1
+            )
+        )
+
+    def test_upload_is_processed(self):
+        self.client.force_authenticate(self.author)
+        response = self.client.post(
+            '/api/recipes/', self.recipe_data(image=image_data_uri()),
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        recipe = Recipe.objects.get(pk=response.data['id'])
+        self.assertEqual(recipe.image_status, ImageStatus.PENDING)
+        job = ImageJob.objects.get(recipe=recipe)
+        self.assertEqual(job.encoding, ImageJob.Encoding.BASE64)
+        self.assertTrue(default_storage.exists(job.source.name))
+        self.process_jobs()
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.image_status, ImageStatus.READY)
+        self.assertTrue(recipe.image.name.startswith(RENDITIONS_PATH))
+        self.assertIn(recipe.image_hash, recipe.image.name)
+        self.assertTrue(default_storage.exists(recipe.image.name))
+        self.assertFalse(ImageJob.objects.exists())
+        self.assertFalse(default_storage.exists(job.source.name))
+
+    def test_invalid_image(self):
+        job = self.enqueue()
+        self.process_jobs()
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImageJob.Status.FAILED)
+        self.assertEqual(job.attempts, 1)
+        self.assertTrue(job.error)
+        self.assertFalse(job.source)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, ImageStatus.FAILED)
+        self.assertEqual(self.recipe.image.name, 'recipes/images/recipe.png')
+
+    @override_settings(IMAGE_JOB_MAX_ATTEMPTS=3)
+    def test_retries_and_stale_jobs(self):
+        job = self.enqueue()
+        self.assertEqual(ImageJob.objects.claim(), job)
+        ImageJob.objects.fail(ImageJob.objects.get(pk=job.pk), 'Ошибка')
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImageJob.Status.PENDING)
+        self.assertEqual(ImageJob.objects.claim(), job)
+        self.assertIsNone(ImageJob.objects.claim())
+        self.make_stale(job)
+        claimed = ImageJob.objects.claim()
+        self.assertEqual(claimed, job)
+        self.assertEqual(claimed.attempts, 3)
+        self.make_stale(job)
+        self.assertIsNone(ImageJob.objects.claim())
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImageJob.Status.FAILED)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, ImageStatus.FAILED)
+
+    def test_outdated_job_result_is_discarded(self):
+        buffer = BytesIO()
+        Image.new('RGB', (8, 8), 'blue').save(buffer, 'PNG')
+        old_job = self.enqueue(buffer.getvalue())
+        self.assertEqual(ImageJob.objects.claim(), old_job)
+        new_job = self.enqueue()
+        run_image_job(old_job)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, ImageStatus.PENDING)
+        self.assertEqual(self.recipe.image.name, 'recipes/images/recipe.png')
+        ImageJob.objects.complete(old_job)
+        self.assertEqual(ImageJob.objects.get(), new_job)
+
+    def test_recipe_delete_removes_sources(self):
+        job = self.enqueue()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.delete()
+        self.assertFalse(ImageJob.objects.exists())
+        self.assertFalse(default_storage.exists(job.source.name))
+
+    def test_update_keeps_worker_result(self):
+        """Изменение рецепта без изображения не затирает результат воркера."""
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        Recipe.objects.filter(pk=recipe.pk).update(
+            image='recipes/renditions/hash/original.webp',
+            image_hash='hash',
+            image_status=ImageStatus.FAILED
+        )
+        request = APIRequestFactory().patch('/')
+        request.user = self.author
+        serializer = RecipeWriteSerializer(
+            recipe, data=self.recipe_data(name='Новое название'),
+            partial=True, context={'request': request}
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.name, 'Новое название')
+        self.assertEqual(
+            recipe.image.name, 'recipes/renditions/hash/original.webp'
+        )
+        self.assertEqual(recipe.image_hash, 'hash')
+        self.assertEqual(recipe.image_status, ImageStatus.FAILED)
+        self.assertFalse(ImageJob.objects.exists())
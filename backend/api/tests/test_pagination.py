@@ -0,0 +1,133 @@
+import base64
+import json
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from recipes.models import Favorite, Recipe
+from users.models import User
+
+
+def encode(payload):
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+class KeysetPaginationTests(APITestCase):
+    """Пагинация рецептов по курсору."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email='author@example.com', username='author',
+            first_name='Автор', last_name='Рецептов', password='password-1'
+        )
+        for number in range(5):
+            cls.create_recipe(number)
+
+    @classmethod
+    def create_recipe(cls, number):
+        return Recipe.objects.create(
+            author=cls.author, name=f'Рецепт {number}', text='Описание',
+            cooking_time=10, image='recipes/images/recipe.png'
+        )
+
+    def get_page(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return (
+            [recipe['id'] for recipe in response.data['results']],
+            response.data['next']
+        )
+
+    def walk(self, url):
+        """Собирает id рецептов со всех страниц, начиная с url."""
+        ids = []
+        while url:
+            page, url = self.get_page(url)
+            ids += page
+        return ids
+
+    def ordered_ids(self, *ordering):
+        return list(Recipe.objects.order_by(*ordering).values_list(
+            'id', flat=True
+        ))
+
+    def test_pages_cover_all_recipes(self):
+        self.assertEqual(
+            self.walk('/api/recipes/?pagination=cursor&limit=2'),
+            self.ordered_ids('-pub_date', '-id')
+        )
+
+    def test_equal_sort_values(self):
+        """Рецепты с одинаковой датой упорядочиваются по id."""
+        Recipe.objects.update(pub_date=timezone.now())
+        self.assertEqual(
+            self.walk('/api/recipes/?pagination=cursor&limit=2'),
+            self.ordered_ids('-id')
+        )
+
+    def test_popular_ordering(self):
+        readers = [
+            User.objects.create_user(
+                email=f'reader{number}@example.com',
+                username=f'reader{number}', first_name='Читатель',
+                last_name=str(number), password='password-1'
+            )
+            for number in range(2)
+        ]
+        recipes = self.ordered_ids('id')
+        for recipe_id, count in zip(recipes, (1, 2, 1)):
+            for reader in readers[:count]:
+                Favorite.objects.create(user=reader, recipe_id=recipe_id)
+        self.assertEqual(
+            self.walk('/api/recipes/?ordering=popular&pagination=cursor'
+                      '&limit=2'),
+            self.ordered_ids('-favorites_count', '-id')
+        )
+
+    def test_new_recipe_between_pages(self):
+        """Новый рецепт не сдвигает следующие страницы."""
+        expected = self.ordered_ids('-pub_date', '-id')
+        page, url = self.get_page('/api/recipes/?pagination=cursor&limit=2')
+        self.create_recipe(5)
+        self.assertEqual(page + self.walk(url), expected)
+
+    def test_page_size(self):
+        for number in range(5, settings.DEFAULT_PAGE_SIZE + 2):
+            self.create_recipe(number)
+        default = settings.DEFAULT_PAGE_SIZE
+        for limit, size in (('2', 2), ('0', default), ('abc', default)):
+            with self.subTest(limit=limit):
+                page, _ = self.get_page(
+                    f'/api/recipes/?pagination=cursor&limit={limit}'
+                )
+                self.assertEqual(len(page), size)
+
+    def test_invalid_cursor(self):
+        cursors = (
+            'not-base64!',
+            base64.urlsafe_b64encode(b'not json').decode(),
+            encode({'pub_date': '2024-01-01T00:00:00+00:00', 'id': '1'}),
+            encode(['2024-01-01T00:00:00+00:00']),
+            encode(['not a date', '1']),
+            encode(['2024-01-01T00:00:00+00:00', 'not a number']),
+            encode([5, 'not a number']),
+        )
+        for cursor in cursors:
+            with self.subTest(cursor=cursor):
+                response = self.client.get(
+                    '/api/recipes/', {'cursor': cursor}
+                )
+                self.assertEqual(
+                    response.status_code, status.HTTP_404_NOT_FOUND
+                )
+
+    def test_cursor_from_other_ordering(self):
+        response = self.client.get(
+            '/api/recipes/?ordering=popular&pagination=cursor&limit=2'
+        )
+        cursor = response.data['next'].split('cursor=')[1].split('&')[0]
+        response = self.client.get('/api/recipes/', {'cursor': cursor})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
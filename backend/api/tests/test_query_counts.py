@@ -0,0 +1,93 @@
+from django.test import override_settings
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from recipes.models import (Favorite, Ingredient, Recipe,
+                            RecipeIngredientsRelated, ShoppingCart, Tag)
+from users.models import Follow, User
+
+RECIPES_PER_AUTHOR = 12
+
+
+@override_settings(RESPONSE_CACHE_ALIAS='', FEED_CACHE_SIZE=0)
+class QueryCountTests(APITestCase):
+    """Количество SQL-запросов постоянно и не зависит от размера страницы."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='reader@example.com', username='reader',
+            first_name='Читатель', last_name='Рецептов', password='password-1'
+        )
+        tags = [
+            Tag.objects.create(name=f'Тег {number}', color=f'#00000{number}',
+                               slug=f'tag{number}')
+            for number in range(3)
+        ]
+        ingredients = [
+            Ingredient.objects.create(name=f'Ингредиент {number}',
+                                      measurement_unit='г')
+            for number in range(5)
+        ]
+        for number in range(5):
+            author = User.objects.create_user(
+                email=f'author{number}@example.com',
+                username=f'author{number}', first_name='Автор',
+                last_name=str(number), password='password-1'
+            )
+            Follow.objects.create(user=cls.user, following=author)
+            for recipe_number in range(RECIPES_PER_AUTHOR):
+                recipe = Recipe.objects.create(
+                    author=author, name=f'Рецепт {recipe_number}',
+                    text='Описание', cooking_time=10,
+                    image='recipes/images/recipe.png'
+                )
+                recipe.tags.set(tags[:1 + recipe_number % 3])
+                for ingredient in ingredients[:2 + recipe_number % 3]:
+                    RecipeIngredientsRelated.objects.create(
+                        recipe=recipe, ingredient=ingredient, amount=10
+                    )
+                if recipe_number % 2:
+                    Favorite.objects.create(user=cls.user, recipe=recipe)
+                    ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+        cls.recipes = list(Recipe.objects.values_list('pk', flat=True))
+
+    def assert_num_queries(self, count, *paths):
+        for path in paths:
+            with self.subTest(path=path), self.assertNumQueries(count):
+                response = self.client.get(path)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def check_endpoints(self):
+        # COUNT(*), рецепты, авторы, теги и ингредиенты.
+        self.assert_num_queries(
+            5, '/api/recipes/?limit=5', '/api/recipes/?limit=50'
+        )
+        self.assert_num_queries(
+            4,
+            '/api/recipes/?pagination=cursor&limit=5',
+            '/api/recipes/?pagination=cursor&limit=50'
+        )
+        self.assert_num_queries(
+            4,
+            f'/api/recipes/{self.recipes[0]}/',
+            f'/api/recipes/{self.recipes[-1]}/'
+        )
+
+    def test_anonymous(self):
+        self.check_endpoints()
+        response = self.client.get('/api/users/subscriptions/')
+        self.assertEqual(
+            response.status_code, status.HTTP_401_UNAUTHORIZED
+        )
+
+    def test_authenticated(self):
+        self.client.force_authenticate(self.user)
+        self.check_endpoints()
+        self.assert_num_queries(
+            3,
+            '/api/users/subscriptions/?limit=1',
+            '/api/users/subscriptions/?limit=5',
+            '/api/users/subscriptions/?limit=5&recipes_limit=1',
+            '/api/users/subscriptions/?limit=5&recipes_limit=10'
+        )
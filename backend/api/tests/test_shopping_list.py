@@ -0,0 +1,142 @@
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from recipes.models import (Ingredient, Recipe, RecipeIngredientsRelated,
+                            ShoppingCart, ShoppingListItem, Tag)
+from users.models import User
+
+
+class ShoppingListTests(APITestCase):
+    """Инкрементальное обновление суммарного списка покупок."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email='author@example.com', username='author',
+            first_name='Автор', last_name='Рецептов', password='password-1'
+        )
+        cls.readers = [
+            User.objects.create_user(
+                email=f'reader{number}@example.com',
+                username=f'reader{number}', first_name='Читатель',
+                last_name=str(number), password='password-1'
+            )
+            for number in range(3)
+        ]
+        cls.tag = Tag.objects.create(name='Тег', color='#000000', slug='tag')
+        cls.ingredients = [
+            Ingredient.objects.create(name=f'Ингредиент {number}',
+                                      measurement_unit='г')
+            for number in range(3)
+        ]
+        cls.soup = cls.create_recipe('Суп', {0: 100, 1: 20})
+        cls.salad = cls.create_recipe('Салат', {1: 30, 2: 5})
+
+    @classmethod
+    def create_recipe(cls, name, amounts):
+        recipe = Recipe.objects.create(
+            author=cls.author, name=name, text='Описание',
+            cooking_time=10, image='recipes/images/recipe.png'
+        )
+        recipe.tags.set((cls.tag,))
+        for number, amount in amounts.items():
+            RecipeIngredientsRelated.objects.create(
+                recipe=recipe, ingredient=cls.ingredients[number],
+                amount=amount
+            )
+        return recipe
+
+    def shopping_list(self, user):
+        self.client.force_authenticate(user)
+        response = self.client.get('/api/recipes/shopping_list/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return {
+            self.ingredients.index(
+                Ingredient.objects.get(pk=item['id'])
+            ): item['amount']
+            for item in response.data
+        }
+
+    def assert_matches_rebuild(self):
+        """Инкрементальный список совпадает с пересчитанным с нуля."""
+        items = sorted(ShoppingListItem.objects.values_list(
+            'user', 'ingredient', 'total_amount'
+        ))
+        ShoppingListItem.objects.rebuild()
+        self.assertEqual(items, sorted(ShoppingListItem.objects.values_list(
+            'user', 'ingredient', 'total_amount'
+        )))
+
+    def test_add_and_remove_recipes(self):
+        reader = self.readers[0]
+        self.client.force_authenticate(reader)
+        for recipe in (self.soup, self.salad):
+            response = self.client.post(
+                f'/api/recipes/{recipe.pk}/shopping_cart/'
+            )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.shopping_list(reader), {0: 100, 1: 50, 2: 5})
+        response = self.client.delete(
+            f'/api/recipes/{self.soup.pk}/shopping_cart/'
+        )
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.shopping_list(reader), {1: 30, 2: 5})
+        ShoppingCart.objects.filter(user=reader).delete()
+        self.assertEqual(self.shopping_list(reader), {})
+
+    def test_recipe_update(self):
+        for reader in self.readers[:2]:
+            ShoppingCart.objects.create(user=reader, recipe=self.soup)
+        ShoppingCart.objects.create(user=self.readers[0], recipe=self.salad)
+        self.client.force_authenticate(self.author)
+        response = self.client.patch(
+            f'/api/recipes/{self.soup.pk}/',
+            {
+                'tags': [self.tag.pk],
+                'ingredients': [
+                    {'id': self.ingredients[1].pk, 'amount': 25},
+                    {'id': self.ingredients[2].pk, 'amount': 1},
+                ],
+            },
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            self.shopping_list(self.readers[0]), {1: 55, 2: 6}
+        )
+        self.assertEqual(self.shopping_list(self.readers[1]), {1: 25, 2: 1})
+        self.assertEqual(self.shopping_list(self.readers[2]), {})
+        self.assert_matches_rebuild()
+
+    def test_recipe_delete(self):
+        for reader in self.readers:
+            ShoppingCart.objects.create(user=reader, recipe=self.soup)
+        ShoppingCart.objects.create(user=self.readers[0], recipe=self.salad)
+        self.soup.delete()
+        self.assertEqual(self.shopping_list(self.readers[0]), {1: 30, 2: 5})
+        for reader in self.readers[1:]:
+            self.assertEqual(self.shopping_list(reader), {})
+        self.assertEqual(
+            Recipe.objects.values_list('cart_count', flat=True).get(
+                pk=self.salad.pk
+            ),
+            1
+        )
+        self.assert_matches_rebuild()
+
+    def test_recipe_delete_queries(self):
+        """Число запросов при удалении рецепта не зависит от числа корзин."""
+        ShoppingCart.objects.create(user=self.readers[0], recipe=self.soup)
+        for reader in self.readers:
+            ShoppingCart.objects.create(user=reader, recipe=self.salad)
+        with self.assertNumQueries(17):
+            self.soup.delete()
+        with self.assertNumQueries(17):
+            Recipe.objects.filter(pk=self.salad.pk).delete()
+        self.assertFalse(ShoppingListItem.objects.exists())
+
+    def test_user_delete(self):
+        ShoppingCart.objects.create(user=self.readers[0], recipe=self.soup)
+        ShoppingCart.objects.create(user=self.author, recipe=self.soup)
+        self.author.delete()
+        self.assertFalse(ShoppingListItem.objects.exists())
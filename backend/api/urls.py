@@ -1,6 +1,9 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
+from api.common.asyncviews import async_patterns
+from api.common.views import metrics
 from api.recipes.views import IngredientViewSet, RecipeViewSet, TagViewSet
 from api.users.views import UserViewSet
 
@@ -13,4 +16,8 @@ router.register('users', UserViewSet, basename='users')
 urlpatterns = [
     path('', include(router.urls)),
     path('auth/', include('djoser.urls.authtoken')),
+    path('metrics/', metrics, name='metrics'),
 ]
+
+if settings.ASYNC_VIEWS:
+    urlpatterns = async_patterns(urlpatterns)
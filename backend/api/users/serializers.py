@@ -2,13 +2,13 @@ from django.contrib.auth import get_user_model
 from rest_framework import serializers
 from rest_framework.validators import UniqueTogetherValidator
 
-from api.common.serializers import RecipeShortSerializer
+from api.common.serializers import RecipeShortSerializer, TimedSerializerMixin
 from users.models import Follow
 
 User = get_user_model()
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Сериализатор объектов User."""
 
     is_subscribed = serializers.SerializerMethodField()
@@ -27,6 +27,8 @@ class UserSerializer(serializers.ModelSerializer):
         extra_kwargs = {'password': {'write_only': True}}
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         request = self.context.get('request')
         return (request and request.user.is_authenticated
                 and request.user.subscriptions.filter(
@@ -34,23 +36,37 @@ class UserSerializer(serializers.ModelSerializer):
                 ).exists())
 
 
+class RecipesLimitSerializer(serializers.Serializer):
+    """Сериализатор для проверки параметра запроса recipes_limit."""
+
+    recipes_limit = serializers.IntegerField(min_value=0, required=False)
+
+
+def get_recipes_limit(request):
+    """Возвращает проверенное значение recipes_limit или None."""
+    serializer = RecipesLimitSerializer(data=request.query_params)
+    serializer.is_valid(raise_exception=True)
+    return serializer.validated_data.get('recipes_limit')
+
+
 class UserForFollowSerializer(UserSerializer):
-    """Расширенный сериализатор объектов User с полями для рецептов."""
+    """
+    Расширенный сериализатор объектов User с полями для рецептов.
+    Использует рецепты из атрибута latest_recipes, если они загружены.
+    """
 
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
+    recipes_count = serializers.ReadOnlyField()
 
     def get_recipes(self, user):
-        request = self.context.get('request')
-        limit = request.query_params.get('recipes_limit')
-        recipes = user.recipes.all()
-        if limit is not None:
-            recipes = recipes[:int(limit)]
+        recipes = getattr(user, 'latest_recipes', None)
+        if recipes is None:
+            limit = self.context.get('recipes_limit')
+            recipes = user.recipes.all()
+            if limit is not None:
+                recipes = recipes[:limit]
         return RecipeShortSerializer(recipes, many=True).data
 
-    def get_recipes_count(self, user):
-        return user.recipes.count()
-
     class Meta(UserSerializer.Meta):
         fields = UserSerializer.Meta.fields + ('recipes', 'recipes_count',)
 
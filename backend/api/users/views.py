@@ -1,4 +1,5 @@
 from django.contrib.auth import get_user_model
+from django.db.models import BooleanField, Value
 from django.shortcuts import get_object_or_404
 from djoser import views
 from rest_framework import status
@@ -6,8 +7,10 @@ from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
-from api.common.paginators import PagePagination
-from api.users.serializers import FollowSerializer, UserForFollowSerializer
+from api.common.paginators import HybridPagination, PagePagination
+from api.users.serializers import (FollowSerializer, UserForFollowSerializer,
+                                   get_recipes_limit)
+from recipes.models import Recipe
 from users.models import Follow
 
 User = get_user_model()
@@ -17,6 +20,7 @@ class UserViewSet(views.UserViewSet):
     """Вьюсет для работы с объектами User."""
 
     pagination_class = PagePagination
+    keyset_ordering = ('username', 'id')
 
     def get_permissions(self):
         """Добавляет права доступа IsAuthenticated к url path - me."""
@@ -33,6 +37,7 @@ class UserViewSet(views.UserViewSet):
     )
     def delete_post_subscribe(self, request, id):
         """Оформляет/отменяет подписку на другого пользователя."""
+        recipes_limit = get_recipes_limit(request)
         following = get_object_or_404(User, id=id)
         if request.method in ['DELETE']:
             count, del_dict = Follow.objects.filter(
@@ -45,7 +50,7 @@ class UserViewSet(views.UserViewSet):
                 )
             return Response(status=status.HTTP_204_NO_CONTENT)
         serializer = self.get_serializer(
-            context={'request': request},
+            context={'request': request, 'recipes_limit': recipes_limit},
             data={'user': request.user.id, 'following': following.id}
         )
         serializer.is_valid(raise_exception=True)
@@ -56,13 +61,24 @@ class UserViewSet(views.UserViewSet):
         methods=('get',),
         detail=False,
         url_path='subscriptions',
-        pagination_class=PagePagination,
+        pagination_class=HybridPagination,
         permission_classes=(IsAuthenticated,),
         serializer_class=UserForFollowSerializer
     )
     def get_all_subscriptions(self, request):
-        """Получить список всех подписок пользователя."""
-        queryset = User.objects.filter(followings__user=request.user)
+        """
+        Получить список всех подписок пользователя.
+        Последние рецепты всех авторов страницы загружаются одним запросом.
+        """
+        recipes_limit = get_recipes_limit(request)
+        queryset = User.objects.filter(
+            followings__user=request.user
+        ).annotate(is_subscribed=Value(True, output_field=BooleanField()))
         page = self.paginate_queryset(queryset)
+        latest_recipes = Recipe.objects.latest_by_author(
+            [user.id for user in page], recipes_limit
+        )
+        for user in page:
+            user.latest_recipes = latest_recipes[user.id]
         serializer = self.get_serializer(page, many=True)
         return self.get_paginated_response(serializer.data)
@@ -28,6 +28,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.common.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -57,6 +58,20 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'foodgram.wsgi.application'
 
+# Время жизни постоянного соединения с БД, в секундах (0 - новое
+# соединение на каждый запрос).
+DB_CONN_MAX_AGE = int(os.getenv('DB_CONN_MAX_AGE', 60))
+
+# Проверка переиспользуемых соединений в начале запроса.
+DB_HEALTH_CHECKS = (os.getenv('DB_HEALTH_CHECKS', 'True') == 'True')
+
+# Проверяются только соединения, простаивавшие дольше, в секундах.
+DB_HEALTH_CHECK_IDLE = float(os.getenv('DB_HEALTH_CHECK_IDLE', 10))
+
+# Подключение через pgbouncer в режиме pool_mode = transaction: серверные
+# курсоры (QuerySet.iterator()) не переживают смену соединения пулером.
+DB_POOLER_MODE = (os.getenv('DB_POOLER_MODE', 'False') == 'True')
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
@@ -64,10 +79,33 @@ DATABASES = {
         'USER': os.getenv('POSTGRES_USER', 'django_user'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', 'django_password'),
         'HOST': os.getenv('DB_HOST', ''),
-        'PORT': os.getenv('DB_PORT', 5432)
+        'PORT': os.getenv('DB_PORT', 5432),
+        'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+        'DISABLE_SERVER_SIDE_CURSORS': DB_POOLER_MODE,
+        'OPTIONS': {
+            'connect_timeout': int(os.getenv('DB_CONNECT_TIMEOUT', 5)),
+        },
     }
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
+# Кэш по умолчанию общий для всех процессов (например, memcached).
+# Кэши, которые нужно сбрасывать сразу во всех воркерах, по умолчанию
+# используют его только в этом случае.
+SHARED_CACHE = CACHES['default']['BACKEND'].rsplit('.', 1)[-1] not in (
+    'LocMemCache', 'DummyCache'
+)
+
+SHARED_CACHE_ALIAS = 'default' if SHARED_CACHE else ''
+
 AUTH_USER_MODEL = 'users.User'
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -111,7 +149,12 @@ REST_FRAMEWORK = {
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.common.authentication.CachedTokenAuthentication',
+    ],
+
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.common.renderers.TimedJSONRenderer',
+        'api.common.renderers.TimedBrowsableAPIRenderer',
     ],
 }
 
@@ -152,3 +195,100 @@ MAXL_TAG_ATTRS = 10
 MAXL_USERS_ATTRS = 150
 
 DEFAULT_PAGE_SIZE = 6
+
+RECIPE_IMAGE_FORMAT = os.getenv('RECIPE_IMAGE_FORMAT', 'WEBP')
+
+RECIPE_IMAGE_QUALITY = 85
+
+RECIPE_IMAGE_RENDITIONS = {
+    'card': (480, 480),
+    'detail': (1200, 1200),
+}
+
+RECIPE_IMAGE_MAX_SIZE = 15 * 1024 * 1024
+
+RECIPE_IMAGE_MAX_PIXELS = 40 * 1000 * 1000
+
+IMAGE_JOB_MAX_ATTEMPTS = 3
+
+IMAGE_JOB_POLL_INTERVAL = 1
+
+IMAGE_JOB_TIMEOUT = 300
+
+# Конфигурация полнотекстового поиска рецептов в PostgreSQL.
+RECIPE_SEARCH_CONFIG = os.getenv('RECIPE_SEARCH_CONFIG', 'russian')
+
+MAX_PAGE_SIZE = 100
+
+# Начиная с этого количества строк пагинатор page/limit берет оценку
+# из статистики PostgreSQL вместо COUNT(*). 0 - всегда точный подсчет.
+APPROXIMATE_COUNT_THRESHOLD = int(os.getenv('APPROXIMATE_COUNT_THRESHOLD', 0))
+
+# Общий кэш для справочников. Пустое значение - только кэш в памяти
+# процесса, изменения доходят до других воркеров через REFERENCE_CACHE_TTL.
+REFERENCE_CACHE_ALIAS = os.getenv('REFERENCE_CACHE_ALIAS', SHARED_CACHE_ALIAS)
+
+# Период перечитывания справочников без общего кэша, в секундах.
+REFERENCE_CACHE_TTL = int(os.getenv('REFERENCE_CACHE_TTL', 30))
+
+# Общий кэш для токенов. Пустое значение - без общего кэша.
+TOKEN_CACHE_ALIAS = os.getenv('TOKEN_CACHE_ALIAS', SHARED_CACHE_ALIAS)
+
+# Размер LRU-кэша токенов в памяти процесса, если общего кэша нет.
+# Отзыв токена до него доходит только в том же процессе, поэтому
+# по умолчанию он отключен; включать только при одном воркере.
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', 0))
+
+TOKEN_CACHE_TTL = int(os.getenv('TOKEN_CACHE_TTL', 60))
+
+# Кэш ответов для анонимных пользователей. Пустое значение - без кэша.
+# Кэш в памяти процесса не подходит: сброс не дойдет до других воркеров.
+RESPONSE_CACHE_ALIAS = os.getenv('RESPONSE_CACHE_ALIAS', SHARED_CACHE_ALIAS)
+
+# Срок хранения ответов в кэше, в секундах.
+RESPONSE_CACHE_TTL = int(os.getenv('RESPONSE_CACHE_TTL', 300))
+
+# max-age в Cache-Control для клиентов и proxy_cache nginx, в секундах.
+RESPONSE_CACHE_MAX_AGE = int(os.getenv('RESPONSE_CACHE_MAX_AGE', 10))
+
+# Кэш начала ленты подписок. Нулевой размер - лента только из БД.
+FEED_CACHE_ALIAS = os.getenv('FEED_CACHE_ALIAS', 'default')
+
+FEED_CACHE_SIZE = int(os.getenv('FEED_CACHE_SIZE', 0))
+
+FEED_CACHE_TTL = int(os.getenv('FEED_CACHE_TTL', 600))
+
+# Асинхронные обертки view API для запуска под ASGI (uvicorn). Включается
+# в foodgram/asgi.py, под WSGI только добавляет накладные расходы.
+ASYNC_VIEWS = (os.getenv('ASYNC_VIEWS', 'False') == 'True')
+
+# Размер пула потоков для view API в режиме ASYNC_VIEWS.
+ASYNC_VIEW_THREADS = int(os.getenv('ASYNC_VIEW_THREADS', 8))
+
+# Период полураспада веса добавлений в рейтинге трендов, в часах.
+TRENDING_HALF_LIFE = float(os.getenv('TRENDING_HALF_LIFE', 24))
+
+# Пересчет трендов учитывает добавления старше этого времени, в секундах:
+# транзакция с более новым добавлением может быть еще не зафиксирована.
+TRENDING_COMMIT_DELAY = int(os.getenv('TRENDING_COMMIT_DELAY', 60))
+
+# Замеры запросов: заголовок Server-Timing и метрики api/metrics/.
+METRICS_ENABLED = (os.getenv('METRICS_ENABLED', 'True') == 'True')
+
+METRICS_SERVER_TIMING = (os.getenv('METRICS_SERVER_TIMING', 'True') == 'True')
+
+# Доля запросов, для которых сохраняются тексты SQL (поиск N+1).
+METRICS_SAMPLE_RATE = float(os.getenv('METRICS_SAMPLE_RATE', 0.1))
+
+# Запросы дольше этого времени (мс) записываются в лог.
+METRICS_SLOW_REQUEST_MS = int(os.getenv('METRICS_SLOW_REQUEST_MS', 500))
+
+# Сколько раз должен повториться SQL-запрос, чтобы попасть в лог.
+METRICS_DUPLICATE_QUERIES = 5
+
+# Каталог для счетчиков воркеров, общий для процессов сервера (задается
+# в gunicorn.conf.py). Пустое значение - метрики каждого процесса отдельно.
+METRICS_DIR = os.getenv('METRICS_DIR', '')
+
+# Как часто процесс сохраняет свои счетчики в METRICS_DIR, в секундах.
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', 1))
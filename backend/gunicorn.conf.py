@@ -0,0 +1,72 @@
+"""
+Настройки gunicorn. Количество воркеров и потоков рассчитывается по
+числу доступных процессору ядер, любое значение можно переопределить
+переменными окружения GUNICORN_*.
+"""
+import os
+import shutil
+import tempfile
+
+cpus = len(os.sched_getaffinity(0)) if hasattr(
+    os, 'sched_getaffinity'
+) else os.cpu_count() or 1
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+
+# gthread: меньше процессов и памяти, потоки ждут БД параллельно.
+# Для режима ASGI - uvicorn.workers.UvicornWorker и foodgram.asgi.
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+
+workers = int(os.getenv('GUNICORN_WORKERS', cpus + 1))
+
+# Каждый поток держит свое соединение с БД (CONN_MAX_AGE).
+threads = int(os.getenv('GUNICORN_THREADS', min(2 * cpus, 8)))
+
+# Приложение загружается до fork, импорты Django, DRF и Pillow
+# разделяются воркерами (copy-on-write).
+preload_app = (os.getenv('GUNICORN_PRELOAD', 'True') == 'True')
+
+# Перезапуск воркеров против роста памяти; разброс исключает
+# одновременный перезапуск всех воркеров.
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 1000))
+
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+
+# Файлы контроля воркеров в памяти, а не на overlay-файловой системе.
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+# Счетчики метрик воркеров, которые суммирует api/metrics/.
+os.environ.setdefault('METRICS_DIR', os.path.join(
+    '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(),
+    'foodgram-metrics'
+))
+
+
+def run_warm_up():
+    from api.common.warmup import warm_up
+
+    warm_up()
+
+
+def on_starting(server):
+    """Счетчики предыдущего запуска сервера не учитываются."""
+    if os.environ['METRICS_DIR']:
+        shutil.rmtree(os.environ['METRICS_DIR'], ignore_errors=True)
+
+
+def when_ready(server):
+    """С preload_app прогрев выполняется один раз в мастер-процессе."""
+    if server.cfg.preload_app:
+        run_warm_up()
+
+
+def post_worker_init(worker):
+    if not worker.cfg.preload_app:
+        run_warm_up()
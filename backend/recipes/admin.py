@@ -1,7 +1,11 @@
+from django import forms
 from django.contrib import admin
 
+from recipes.images import process_recipe_image
 from recipes.models import (Favorite, Ingredient, Recipe,
-                            RecipeIngredientsRelated, Tag, ShoppingCart)
+                            RecipeIngredientsRelated, Tag, ShoppingCart,
+                            ShoppingListItem)
+from recipes.search import search_recipes, update_search_vector
 
 
 admin.site.empty_value_display = 'Не задано'
@@ -27,19 +31,64 @@ class IngredientAdmin(admin.ModelAdmin):
     search_fields = ('name',)
 
 
+class RecipeAdminForm(forms.ModelForm):
+    """
+    Форма рецепта. Изображение в модели необязательно: через API рецепт
+    сохраняется до обработки изображения очередью. В админ-зоне
+    изображение загружается сразу и обязательно.
+    """
+
+    class Meta:
+        model = Recipe
+        fields = '__all__'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['image'].required = True
+
+
 class RecipeAdmin(admin.ModelAdmin):
     """Кастомный интерфейс админ-зоны для рецептов."""
 
+    form = RecipeAdminForm
     list_display = ('name', 'author', 'pub_date', 'count_in_favorites')
-    readonly_fields = ('count_in_favorites',)
+    readonly_fields = ('count_in_favorites', 'cart_count')
     search_fields = ('name',)
     list_filter = ('tags', 'author',)
     filter_horizontal = ('tags',)
     inlines = (IngredientInline,)
 
-    @admin.display(description='Количество добавлений в избранное')
+    def save_model(self, request, obj, form, change):
+        if change and 'image' not in form.changed_data:
+            # Изображение могла обновить очередь обработки после загрузки
+            # формы, поэтому его поля не перезаписываются.
+            obj.save(update_fields=obj.fields_for_update(*Recipe.image_fields))
+            return
+        super().save_model(request, obj, form, change)
+        if 'image' in form.changed_data:
+            process_recipe_image(obj)
+
+    def save_related(self, request, form, formsets, change):
+        old_amounts = (
+            form.instance.get_ingredient_amounts() if change else {}
+        )
+        super().save_related(request, form, formsets, change)
+        update_search_vector(form.instance.pk)
+        if change:
+            ShoppingListItem.objects.apply_recipe_changes(
+                form.instance, old_amounts
+            )
+
+    def get_search_results(self, request, queryset, search_term):
+        """Поиск по полнотекстовому индексу вместо LIKE по названию."""
+        return search_recipes(queryset, search_term, rank=False), False
+
+    @admin.display(
+        description='Количество добавлений в избранное',
+        ordering='favorites_count'
+    )
     def count_in_favorites(self, obj):
-        return obj.favorites.count()
+        return obj.favorites_count
 
 
 class FavoriteAdmin(admin.ModelAdmin):
@@ -0,0 +1,175 @@
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+
+class ReferenceData:
+    """Снимок справочных данных с версией для условных запросов."""
+
+    def __init__(self, items, version, last_modified):
+        self.items = items
+        self.version = version
+        self.last_modified = last_modified
+        self.by_id = {item['id']: item for item in items}
+        self._derived = {}
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_derived'] = {}
+        return state
+
+    def derived(self, name, factory):
+        """
+        Возвращает структуру, построенную factory по элементам снимка.
+        Структура строится один раз на каждую версию данных.
+        """
+        if name not in self._derived:
+            self._derived[name] = factory(self.items)
+        return self._derived[name]
+
+    @classmethod
+    def build(cls, items):
+        """Создает снимок, версия которого вычисляется по содержимому."""
+        payload = json.dumps(items, sort_keys=True, ensure_ascii=False)
+        version = hashlib.md5(payload.encode()).hexdigest()
+        return cls(items, version, datetime.now(timezone.utc))
+
+
+class ReferenceDataCache:
+    """
+    Двухуровневый кэш справочных данных (теги, ингредиенты).
+
+    Первый уровень хранится в памяти процесса, второй - в общем кэше
+    Django с алиасом REFERENCE_CACHE_ALIAS. При общем кэше каждый вызов
+    get() сверяет версию снимка в памяти с ключом версии в общем кэше
+    (один GET), поэтому invalidate() в любом процессе сразу действует во
+    всех воркерах. Без общего кэша снимок в памяти перечитывается из БД
+    раз в REFERENCE_CACHE_TTL секунд. Версия снимка зависит только от
+    содержимого, поэтому ETag совпадает у всех воркеров.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.key = f'reference:{name}'
+        self.version_key = f'reference:{name}:version'
+        self._lock = threading.Lock()
+        self._local = None
+        self._checked_at = 0
+
+    @property
+    def shared(self):
+        alias = settings.REFERENCE_CACHE_ALIAS
+        return caches[alias] if alias else None
+
+    def get(self, loader):
+        """
+        Возвращает актуальный снимок данных.
+
+        loader вызывается без аргументов и возвращает список словарей,
+        только если данных нет ни в одном из уровней кэша.
+        """
+        shared = self.shared
+        if shared is not None:
+            return self._get_shared(shared, loader)
+        now = time.monotonic()
+        if (self._local is not None
+                and now - self._checked_at < settings.REFERENCE_CACHE_TTL):
+            return self._local
+        with self._lock:
+            if (self._local is None
+                    or now - self._checked_at >= settings.REFERENCE_CACHE_TTL):
+                self._local = ReferenceData.build(loader())
+                self._checked_at = time.monotonic()
+        return self._local
+
+    def _get_shared(self, shared, loader):
+        version = shared.get(self.version_key)
+        local = self._local
+        if local is not None and local.version == version:
+            return local
+        with self._lock:
+            data = shared.get(self.key)
+            if data is None or version not in (None, data.version):
+                data = ReferenceData.build(loader())
+                shared.set(self.key, data, timeout=None)
+            if version != data.version:
+                shared.set(self.version_key, data.version, timeout=None)
+            if self._local is None or self._local.version != data.version:
+                self._local = data
+        return self._local
+
+    def invalidate(self):
+        """
+        Сбрасывает оба уровня кэша после фиксации текущей транзакции:
+        иначе другой воркер успел бы сохранить в общий кэш данные до
+        изменения.
+        """
+        transaction.on_commit(self._clear)
+
+    def _clear(self):
+        with self._lock:
+            self._local = None
+            self._checked_at = 0
+        shared = self.shared
+        if shared is not None:
+            shared.delete_many((self.key, self.version_key))
+
+
+class ResponseCache:
+    """
+    Кэш ответов API в кэше Django с алиасом RESPONSE_CACHE_ALIAS.
+
+    Ключи содержат версию данных. invalidate() меняет версию, и все
+    сохраненные ответы перестают использоваться сразу, без перебора
+    ключей (старые записи удаляются по истечении RESPONSE_CACHE_TTL).
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.version_key = f'response:{name}:version'
+
+    @property
+    def cache(self):
+        alias = settings.RESPONSE_CACHE_ALIAS
+        return caches[alias] if alias else None
+
+    def get_version(self):
+        version = self.cache.get(self.version_key)
+        if version is None:
+            self.cache.add(self.version_key, uuid4().hex, timeout=None)
+            version = self.cache.get(self.version_key)
+        return version
+
+    def get(self, *parts):
+        """
+        Возвращает (ключ, версия, запись) для частей ключа parts.
+        Запись равна None, если ответа нет в кэше.
+        """
+        version = self.get_version()
+        digest = hashlib.md5(
+            json.dumps(parts, ensure_ascii=False).encode()
+        ).hexdigest()
+        key = f'response:{self.name}:{version}:{digest}'
+        return key, version, self.cache.get(key)
+
+    def set(self, key, entry):
+        self.cache.set(key, entry, timeout=settings.RESPONSE_CACHE_TTL)
+
+    def invalidate(self):
+        """Меняет версию данных после фиксации текущей транзакции."""
+        if self.cache is not None:
+            transaction.on_commit(lambda: self.cache.set(
+                self.version_key, uuid4().hex, timeout=None
+            ))
+
+
+tags_cache = ReferenceDataCache('tags')
+ingredients_cache = ReferenceDataCache('ingredients')
+recipes_response_cache = ResponseCache('recipes')
@@ -0,0 +1,134 @@
+"""
+Лента рецептов авторов, на которых подписан пользователь.
+
+Лента строится при чтении: рецепты выбираются условием author IN
+(подзапрос подписок) по индексу (author, -pub_date, -id), страницы -
+по курсору. Если задан FEED_CACHE_SIZE, начало ленты (до FEED_CACHE_SIZE
+позиций) хранится в кэше списком пар (pub_date, id), и страницы в его
+пределах выбираются по первичному ключу. Новый рецепт добавляется
+только в уже сохраненные ленты подписчиков автора, поэтому стоимость
+публикации зависит от числа активных читателей, а не всех подписчиков.
+"""
+from django.conf import settings
+from django.core.cache import caches
+
+from recipes.models import Recipe
+from recipes.transfer import batches
+from users.models import Follow
+
+FAN_OUT_BATCH_SIZE = 1000
+
+
+def feed_recipes(queryset, user):
+    """Рецепты авторов, на которых подписан user."""
+    return queryset.filter(
+        author__in=Follow.objects.filter(user=user).values('following')
+    )
+
+
+class FeedTimelineCache:
+    """
+    Кэш начала ленты пользователей в кэше Django с алиасом
+    FEED_CACHE_ALIAS. Запись ленты - словарь с отсортированным от новых
+    к старым списком entries и признаком complete (в ленте нет
+    рецептов старше сохраненных).
+    """
+
+    @property
+    def cache(self):
+        alias = settings.FEED_CACHE_ALIAS
+        if not alias or not settings.FEED_CACHE_SIZE:
+            return None
+        return caches[alias]
+
+    @staticmethod
+    def key(user_id):
+        return f'feed:{user_id}'
+
+    def load(self, user):
+        """Возвращает ленту из кэша или строит ее запросом к БД."""
+        timeline = self.cache.get(self.key(user.pk))
+        if timeline is None:
+            size = settings.FEED_CACHE_SIZE
+            entries = list(feed_recipes(Recipe.objects.all(), user).order_by(
+                '-pub_date', '-id'
+            ).values_list('pub_date', 'id')[:size + 1])
+            timeline = {
+                'entries': entries[:size],
+                'complete': len(entries) <= size,
+            }
+            self.cache.set(
+                self.key(user.pk), timeline, timeout=settings.FEED_CACHE_TTL
+            )
+        return timeline
+
+    def candidates(self, user, position, count):
+        """
+        Возвращает до count id рецептов ленты после позиции position
+        (pub_date, id) или None, если сохраненной части ленты не хватает
+        и страницу нужно выбирать запросом к БД.
+        """
+        if self.cache is None:
+            return None
+        timeline = self.load(user)
+        entries = timeline['entries']
+        start = 0
+        if position is not None:
+            position = tuple(position)
+            start = next(
+                (index for index, entry in enumerate(entries)
+                 if tuple(entry) < position),
+                len(entries)
+            )
+        ids = [pk for _, pk in entries[start:start + count]]
+        if len(ids) < count and not timeline['complete']:
+            return None
+        return ids
+
+    def _update_followers(self, author_id, change):
+        """Применяет change к сохраненным лентам подписчиков автора."""
+        cache = self.cache
+        if cache is None:
+            return
+        followers = Follow.objects.filter(
+            following=author_id
+        ).values_list('user_id', flat=True).iterator()
+        for batch in batches(followers, FAN_OUT_BATCH_SIZE):
+            timelines = cache.get_many([self.key(user) for user in batch])
+            for timeline in timelines.values():
+                change(timeline)
+            if timelines:
+                cache.set_many(timelines, timeout=settings.FEED_CACHE_TTL)
+
+    def push(self, recipe):
+        """Добавляет новый рецепт в сохраненные ленты подписчиков."""
+        size = settings.FEED_CACHE_SIZE
+
+        def add(timeline):
+            entries = timeline['entries']
+            entries.append((recipe.pub_date, recipe.pk))
+            entries.sort(reverse=True)
+            if len(entries) > size:
+                del entries[size:]
+                timeline['complete'] = False
+
+        self._update_followers(recipe.author_id, add)
+
+    def remove(self, author_id, recipe_id):
+        """Удаляет рецепт из сохраненных лент подписчиков автора."""
+        def discard(timeline):
+            timeline['entries'] = [
+                entry for entry in timeline['entries']
+                if entry[1] != recipe_id
+            ]
+
+        self._update_followers(author_id, discard)
+
+    def invalidate(self, user_id):
+        """Сбрасывает ленту пользователя после изменения подписок."""
+        cache = self.cache
+        if cache is not None:
+            cache.delete(self.key(user_id))
+
+
+feed_timelines = FeedTimelineCache()
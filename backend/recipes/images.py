@@ -0,0 +1,184 @@
+import base64
+import binascii
+import hashlib
+import posixpath
+from functools import partial
+from io import BytesIO
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, features
+
+RENDITIONS_PATH = 'recipes/renditions/'
+ORIGINAL = 'original'
+# Размер куска потоковой обработки. Кратен 4, поэтому куски base64
+# декодируются независимо друг от друга.
+CHUNK_SIZE = 64 * 1024
+
+
+def get_image_format():
+    """Формат изображений: WebP, если Pillow собран с его поддержкой."""
+    if settings.RECIPE_IMAGE_FORMAT == 'WEBP' and features.check('webp'):
+        return 'WEBP', '.webp'
+    return 'JPEG', '.jpg'
+
+
+def rendition_name(image_name, rendition):
+    """Имя файла варианта изображения рядом с исходным."""
+    directory, filename = posixpath.split(image_name)
+    extension = posixpath.splitext(filename)[1]
+    return posixpath.join(directory, rendition + extension)
+
+
+def encode(image, image_format, size=None):
+    """
+    Кодирует изображение, уменьшая его до size.
+    Метаданные (EXIF, ICC и т.п.) при сохранении не переносятся.
+    """
+    image = image.copy()
+    if size:
+        image.thumbnail(size, Image.LANCZOS)
+    if image_format == 'JPEG' and image.mode != 'RGB':
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A')
+                         if 'A' in image.getbands() else None)
+        image = background
+    buffer = BytesIO()
+    image.save(
+        buffer,
+        image_format,
+        quality=settings.RECIPE_IMAGE_QUALITY,
+        optimize=True
+    )
+    return buffer.getvalue()
+
+
+class InvalidImageError(ValueError):
+    """Загруженные данные не являются допустимым изображением."""
+
+
+class ImageTooLargeError(InvalidImageError):
+    """Изображение превышает ограничения по объему или числу пикселей."""
+
+
+def check_data_size(size):
+    """Проверяет объем декодированных данных изображения."""
+    if size > settings.RECIPE_IMAGE_MAX_SIZE:
+        raise ImageTooLargeError(
+            'Размер изображения не должен превышать '
+            f'{settings.RECIPE_IMAGE_MAX_SIZE // (1024 * 1024)} МБ.'
+        )
+
+
+def read_image_header(file):
+    """
+    Читает из file только заголовок изображения (без декодирования
+    пикселей) и проверяет число пикселей.
+    """
+    try:
+        image = Image.open(file)
+    except (OSError, SyntaxError, Image.DecompressionBombError) as error:
+        raise InvalidImageError(error)
+    width, height = image.size
+    if width * height > settings.RECIPE_IMAGE_MAX_PIXELS:
+        raise ImageTooLargeError(
+            f'Слишком большое изображение: {width}x{height} пикселей.'
+        )
+    return image
+
+
+def write_chunks(chunks, target, decode=False):
+    """
+    Записывает куски bytes в target, при decode - декодируя base64.
+    В памяти одновременно находится только один кусок, превышение
+    RECIPE_IMAGE_MAX_SIZE прерывает запись.
+    """
+    size = 0
+    remainder = b''
+    for chunk in chunks:
+        if decode:
+            chunk = remainder + b''.join(chunk.split())
+            usable = len(chunk) - len(chunk) % 4
+            remainder = chunk[usable:]
+            try:
+                chunk = base64.b64decode(chunk[:usable], validate=True)
+            except binascii.Error as error:
+                raise InvalidImageError(error)
+        size += len(chunk)
+        check_data_size(size)
+        target.write(chunk)
+    if remainder:
+        raise InvalidImageError('Неверная длина данных base64.')
+
+
+def store_renditions(storage, file):
+    """
+    Создает варианты изображения (original и размеры из
+    RECIPE_IMAGE_RENDITIONS) в каталоге, имя которого - хэш содержимого.
+    Одинаковые загрузки используют одни и те же файлы.
+    Возвращает имя файла original и хэш.
+    """
+    file.seek(0)
+    digest = hashlib.sha256()
+    for chunk in iter(partial(file.read, CHUNK_SIZE), b''):
+        digest.update(chunk)
+    digest = digest.hexdigest()
+    image_format, extension = get_image_format()
+    original_name = posixpath.join(
+        RENDITIONS_PATH, digest, ORIGINAL + extension
+    )
+    image = None
+    sizes = {ORIGINAL: None, **settings.RECIPE_IMAGE_RENDITIONS}
+    for rendition, size in sizes.items():
+        name = rendition_name(original_name, rendition)
+        if storage.exists(name):
+            continue
+        if image is None:
+            file.seek(0)
+            image = ImageOps.exif_transpose(read_image_header(file))
+            if image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA')
+        storage.save(name, ContentFile(encode(image, image_format, size)))
+    return original_name, digest
+
+
+def process_recipe_image(recipe):
+    """Обрабатывает уже сохраненное изображение рецепта (админ-зона)."""
+    uploaded_name = recipe.image.name
+    storage = recipe.image.storage
+    with recipe.image.open('rb') as file:
+        recipe.image.name, recipe.image_hash = store_renditions(storage, file)
+    recipe.save(update_fields=('image', 'image_hash'))
+    if uploaded_name != recipe.image.name and not uploaded_name.startswith(
+            RENDITIONS_PATH):
+        storage.delete(uploaded_name)
+
+
+def decode_image_job(job):
+    """
+    Декодирует файл задачи во временный файл (в памяти до
+    FILE_UPLOAD_MAX_MEMORY_SIZE, дальше - на диске) и проверяет,
+    что он содержит изображение допустимого размера.
+    """
+    target = SpooledTemporaryFile(
+        max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+    )
+    try:
+        with job.source.open('rb') as file:
+            write_chunks(
+                file.chunks(CHUNK_SIZE),
+                target,
+                decode=job.encoding == job.Encoding.BASE64
+            )
+        target.seek(0)
+        image = read_image_header(target)
+        try:
+            image.verify()
+        except (OSError, SyntaxError) as error:
+            raise InvalidImageError(error)
+    except BaseException:
+        target.close()
+        raise
+    target.seek(0)
+    return target
@@ -0,0 +1,61 @@
+import os
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.transfer import ENTITIES, FORMATS, write_records
+
+
+class Command(BaseCommand):
+    help = ('Выгружает данные в файлы csv, json или ndjson, '
+            'совместимые с командой import_data.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'entity', choices=(*ENTITIES, 'all'),
+            help='Тип данных; all - все типы в каталог path.'
+        )
+        parser.add_argument(
+            'path',
+            help='Файл (- для стандартного вывода) или каталог для all.'
+        )
+        parser.add_argument(
+            '--format', choices=FORMATS, default='ndjson',
+            help='Формат файлов.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Количество объектов, выбираемых одним запросом.'
+        )
+
+    def handle(self, *args, **options):
+        path, export_format = options['path'], options['format']
+        if options['entity'] == 'all':
+            os.makedirs(path, exist_ok=True)
+            targets = [
+                (entity, os.path.join(path, f'{entity}.{export_format}'))
+                for entity in ENTITIES
+            ]
+        else:
+            targets = [(options['entity'], path)]
+        try:
+            for entity, target in targets:
+                self.export(ENTITIES[entity], target, export_format,
+                            options['batch_size'])
+        except OSError as error:
+            raise CommandError(error)
+
+    def export(self, entity, path, export_format, batch_size):
+        started = time.monotonic()
+        records = entity.export(batch_size)
+        if path == '-':
+            count = write_records(sys.stdout, export_format, entity, records)
+        else:
+            with open(path, 'w', newline='', encoding='utf-8') as file:
+                count = write_records(file, export_format, entity, records)
+        elapsed = time.monotonic() - started
+        self.stderr.write(self.style.SUCCESS(
+            f'{entity.name}: выгружено {count} записей за {elapsed:.1f} с '
+            f'({count / elapsed if elapsed else 0:.0f} в секунду).'
+        ))
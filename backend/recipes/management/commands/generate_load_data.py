@@ -0,0 +1,240 @@
+import random
+import time
+from datetime import timedelta
+from io import BytesIO
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image
+
+from recipes.cache import recipes_response_cache
+from recipes.images import store_renditions
+from recipes.models import (Favorite, Ingredient, Recipe,
+                            RecipeIngredientsRelated, ShoppingCart, Tag)
+from recipes.transfer import batches
+from users.models import Follow, User
+
+PASSWORD = 'load-test-password'
+
+
+def zipf_weights(count, skew):
+    """
+    Накопленные веса распределения Ципфа: элемент с номером i выбирается
+    с вероятностью, пропорциональной 1 / (i + 1) ** skew.
+    """
+    return list(accumulate(1 / (rank + 1) ** skew for rank in range(count)))
+
+
+def sample(population, cum_weights, count, exclude=None):
+    """Выбирает до count различных элементов с учетом весов."""
+    count = min(count, len(population) - (exclude is not None))
+    chosen = set()
+    while len(chosen) < count:
+        item = random.choices(population, cum_weights=cum_weights)[0]
+        if item != exclude:
+            chosen.add(item)
+    return chosen
+
+
+class Command(BaseCommand):
+    help = ('Создает синтетический набор данных для нагрузочного '
+            'тестирования: пользователей, рецепты, избранное, списки '
+            'покупок и подписки. Ингредиенты и теги загружаются из data/.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument(
+            '--ingredients', type=int, nargs=2, default=(3, 12),
+            metavar=('MIN', 'MAX'),
+            help='Количество ингредиентов в рецепте.'
+        )
+        parser.add_argument(
+            '--tags', type=int, nargs=2, default=(1, 3),
+            metavar=('MIN', 'MAX'),
+            help='Количество тегов у рецепта.'
+        )
+        parser.add_argument(
+            '--favorites', type=int, default=20,
+            help='Среднее количество рецептов в избранном пользователя.'
+        )
+        parser.add_argument(
+            '--carts', type=int, default=5,
+            help='Среднее количество рецептов в списке покупок.'
+        )
+        parser.add_argument(
+            '--follows', type=int, default=10,
+            help='Среднее количество подписок пользователя.'
+        )
+        parser.add_argument(
+            '--skew', type=float, default=1.0,
+            help='Показатель распределения Ципфа для популярности авторов, '
+                 'рецептов и ингредиентов (0 - равномерное).'
+        )
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='Период, на который распределяются даты публикации.'
+        )
+        parser.add_argument(
+            '--prefix', default='load',
+            help='Префикс имен и адресов почты пользователей.'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        self.options = options
+        self.started = time.monotonic()
+        if not Ingredient.objects.exists() or not Tag.objects.exists():
+            call_command('import_csv_data', stdout=self.stdout)
+        users = self.create_users()
+        if len(users) < 2:
+            raise CommandError('Нужно хотя бы два пользователя.')
+        recipes = self.create_recipes(users)
+        self.create_relations(
+            Favorite, users, recipes, options['favorites']
+        )
+        self.create_relations(
+            ShoppingCart, users, recipes, options['carts']
+        )
+        self.create_follows(users)
+        call_command('recalculate_counters', stdout=self.stdout)
+        call_command('update_trending', rebuild=True, stdout=self.stdout)
+        recipes_response_cache.invalidate()
+        self.stdout.write(self.style.SUCCESS(
+            f'Набор данных создан за {time.monotonic() - self.started:.1f} с.'
+        ))
+
+    def report(self, name, count):
+        self.stdout.write(
+            f'{name}: {count} ({time.monotonic() - self.started:.1f} с)'
+        )
+
+    def create_users(self):
+        prefix = self.options['prefix']
+        password = make_password(PASSWORD)
+        for batch in batches(range(self.options['users']),
+                             self.options['batch_size']):
+            User.objects.bulk_create([
+                User(
+                    email=f'{prefix}{number}@example.com',
+                    username=f'{prefix}{number}',
+                    first_name='Пользователь',
+                    last_name=str(number),
+                    password=password
+                )
+                for number in batch
+            ], ignore_conflicts=True)
+        users = list(User.objects.filter(
+            username__startswith=prefix
+        ).order_by('pk').values_list('pk', flat=True))
+        self.report('Пользователи', len(users))
+        return users
+
+    def placeholder_image(self):
+        """Общее для всех рецептов изображение с готовыми вариантами."""
+        buffer = BytesIO()
+        Image.new('RGB', (1600, 1200), 'orange').save(buffer, 'JPEG')
+        storage = Recipe._meta.get_field('image').storage
+        return store_renditions(storage, buffer)
+
+    def create_recipes(self, users):
+        options = self.options
+        image, image_hash = self.placeholder_image()
+        tags = list(Tag.objects.values_list('pk', flat=True))
+        ingredients = list(Ingredient.objects.values_list('pk', flat=True))
+        random.shuffle(ingredients)
+        author_weights = zipf_weights(len(users), options['skew'])
+        ingredient_weights = zipf_weights(len(ingredients), options['skew'])
+        now = timezone.now()
+        created = 0
+        for batch in batches(range(options['recipes']),
+                             options['batch_size']):
+            with transaction.atomic():
+                last_pk = Recipe.objects.order_by('-pk').values_list(
+                    'pk', flat=True
+                ).first() or 0
+                Recipe.objects.bulk_create([
+                    Recipe(
+                        author_id=random.choices(
+                            users, cum_weights=author_weights
+                        )[0],
+                        name=f'Рецепт {number}',
+                        text=f'Описание рецепта {number}.',
+                        cooking_time=random.randint(5, 180),
+                        image=image,
+                        image_hash=image_hash
+                    )
+                    for number in batch
+                ])
+                # bulk_create задает дату публикации текущим временем,
+                # даты распределяются по периоду отдельным обновлением.
+                recipes = list(Recipe.objects.filter(pk__gt=last_pk))
+                for recipe in recipes:
+                    recipe.pub_date = now - timedelta(
+                        seconds=random.randint(0, options['days'] * 86400)
+                    )
+                Recipe.objects.bulk_update(recipes, ('pub_date',))
+                Recipe.tags.through.objects.bulk_create([
+                    Recipe.tags.through(recipe_id=recipe.pk, tag_id=tag)
+                    for recipe in recipes
+                    for tag in random.sample(
+                        tags, min(len(tags), random.randint(*options['tags']))
+                    )
+                ])
+                RecipeIngredientsRelated.objects.bulk_create([
+                    RecipeIngredientsRelated(
+                        recipe_id=recipe.pk,
+                        ingredient_id=ingredient,
+                        amount=random.randint(1, 1000)
+                    )
+                    for recipe in recipes
+                    for ingredient in sample(
+                        ingredients, ingredient_weights,
+                        random.randint(*options['ingredients'])
+                    )
+                ])
+            created += len(recipes)
+            self.report('Рецепты', created)
+        return list(Recipe.objects.order_by('pk').values_list('pk', flat=True))
+
+    def create_relations(self, model, users, recipes, average):
+        recipes = recipes.copy()
+        random.shuffle(recipes)
+        weights = zipf_weights(len(recipes), self.options['skew'])
+        created = 0
+        for batch in batches(users, self.options['batch_size']):
+            objects = [
+                model(user_id=user, recipe_id=recipe)
+                for user in batch
+                for recipe in sample(
+                    recipes, weights, random.randint(0, 2 * average)
+                )
+            ]
+            model.objects.bulk_create(objects, ignore_conflicts=True)
+            created += len(objects)
+        self.report(model._meta.verbose_name_plural, created)
+
+    def create_follows(self, users):
+        authors = users.copy()
+        random.shuffle(authors)
+        weights = zipf_weights(len(authors), self.options['skew'])
+        created = 0
+        for batch in batches(users, self.options['batch_size']):
+            objects = [
+                Follow(user_id=user, following_id=author)
+                for user in batch
+                for author in sample(
+                    authors, weights,
+                    random.randint(0, 2 * self.options['follows']),
+                    exclude=user
+                )
+            ]
+            Follow.objects.bulk_create(objects, ignore_conflicts=True)
+            created += len(objects)
+        self.report('Подписки', created)
@@ -1,38 +1,43 @@
 import csv
 
 from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
 
+from recipes.cache import ingredients_cache, tags_cache
 from recipes.models import Ingredient, Tag
+from recipes.transfer import batches
 
 CSV_PATH_INGREDIENTS = './data/ingredients.csv'
 CSV_PATH_TAGS = './data/tags.csv'
+BATCH_SIZE = 1000
 
 
 class Command(BaseCommand):
-    help = 'Загружает данные об ингредиентах из csv файла в базу данных.'
+    help = ('Загружает данные об ингредиентах и теги из csv файлов '
+            'в базу данных. Уже загруженные записи пропускаются.')
 
     def handle(self, *args, **kwargs):
         try:
-            self.load_ingredients()
-            self.load_tags()
-        except Exception as error:
-            CommandError(error)
-        print('Данные об ингредиентах и теги успешно загружены в базу данных!')
-
-    def load_ingredients(self):
-        with open(CSV_PATH_INGREDIENTS, newline='', encoding='utf-8') as file:
-            ingredients = []
-            for row in csv.reader(file, delimiter=','):
-                ingredients.append(
-                    Ingredient(name=row[0], measurement_unit=row[1])
-                )
-            Ingredient.objects.bulk_create(ingredients)
-
-    def load_tags(self):
-        with open(CSV_PATH_TAGS, newline='', encoding='utf-8') as file:
-            tags = []
-            for row in csv.reader(file, delimiter=','):
-                tags.append(
-                    Tag(name=row[0], color=row[1], slug=row[2])
+            self.load(CSV_PATH_INGREDIENTS, Ingredient, lambda row: Ingredient(
+                name=row[0], measurement_unit=row[1]
+            ))
+            self.load(CSV_PATH_TAGS, Tag, lambda row: Tag(
+                name=row[0], color=row[1], slug=row[2]
+            ))
+        except (OSError, IndexError, DatabaseError) as error:
+            raise CommandError(error)
+        finally:
+            ingredients_cache.invalidate()
+            tags_cache.invalidate()
+        self.stdout.write(self.style.SUCCESS(
+            'Данные об ингредиентах и теги успешно загружены в базу данных!'
+        ))
+
+    @staticmethod
+    def load(path, model, build):
+        with open(path, newline='', encoding='utf-8') as file:
+            rows = csv.reader(file, delimiter=',')
+            for batch in batches(rows, BATCH_SIZE):
+                model.objects.bulk_create(
+                    [build(row) for row in batch], ignore_conflicts=True
                 )
-            Tag.objects.bulk_create(tags)
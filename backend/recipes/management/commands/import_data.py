@@ -0,0 +1,113 @@
+import os
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import DatabaseError, connection, transaction
+
+from recipes.cache import ingredients_cache, recipes_response_cache, tags_cache
+from recipes.models import Recipe
+from recipes.transfer import ENTITIES, FORMATS, batches, read_records
+
+
+class Command(BaseCommand):
+    help = ('Загружает данные из файлов csv, json или ndjson пакетами. '
+            'Повторная загрузка обновляет существующие записи.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'entity', choices=(*ENTITIES, 'all'),
+            help='Тип данных; all - все типы из каталога path.'
+        )
+        parser.add_argument(
+            'path',
+            help='Файл с данными или каталог с файлами <тип>.<формат>.'
+        )
+        parser.add_argument(
+            '--format', choices=FORMATS,
+            help='Формат файла (по умолчанию - по расширению).'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Количество записей в одной транзакции.'
+        )
+        parser.add_argument(
+            '--skip-counters', action='store_true',
+            help='Не пересчитывать счетчики после загрузки.'
+        )
+
+    def handle(self, *args, **options):
+        if options['entity'] == 'all':
+            sources = self.directory_sources(
+                options['path'], options['format']
+            )
+        else:
+            sources = [(options['entity'], options['path'],
+                        options['format'] or file_format(options['path']))]
+        try:
+            for entity, path, source_format in sources:
+                self.load(ENTITIES[entity], path, source_format,
+                          options['batch_size'])
+        except (OSError, ValueError, KeyError, DatabaseError) as error:
+            raise CommandError(error)
+        finally:
+            tags_cache.invalidate()
+            ingredients_cache.invalidate()
+            recipes_response_cache.invalidate()
+        self.reset_sequences()
+        if not options['skip_counters']:
+            call_command('recalculate_counters', stdout=self.stdout)
+
+    @staticmethod
+    def directory_sources(directory, source_format):
+        sources = []
+        for entity in ENTITIES:
+            for extension in (source_format,) if source_format else FORMATS:
+                path = os.path.join(directory, f'{entity}.{extension}')
+                if os.path.exists(path):
+                    sources.append((entity, path, extension))
+                    break
+        if not sources:
+            raise CommandError(f'В каталоге {directory} нет файлов данных.')
+        return sources
+
+    def load(self, entity, path, source_format, batch_size):
+        started = time.monotonic()
+        created = updated = 0
+        with open(path, newline='', encoding='utf-8') as file:
+            records = read_records(file, source_format, entity)
+            for batch in batches(records, batch_size):
+                with transaction.atomic():
+                    batch_created, batch_updated = entity.load(batch)
+                created += batch_created
+                updated += batch_updated
+                self.progress(entity, created + updated, started)
+        self.stdout.write(self.style.SUCCESS(
+            f'{entity.name}: создано {created}, обновлено {updated} '
+            f'за {time.monotonic() - started:.1f} с.'
+        ))
+
+    def progress(self, entity, count, started):
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f'{entity.name}: {count} записей '
+            f'({count / elapsed if elapsed else 0:.0f} в секунду)'
+        )
+
+    @staticmethod
+    def reset_sequences():
+        """Сдвигает счетчики id после загрузки рецептов с явными id."""
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(
+                    no_style(), [Recipe]):
+                cursor.execute(sql)
+
+
+def file_format(path):
+    extension = os.path.splitext(path)[1][1:].lower()
+    if extension not in FORMATS:
+        raise CommandError(
+            f'Не удалось определить формат файла {path}, укажите --format.'
+        )
+    return extension
@@ -0,0 +1,70 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from recipes.cache import recipes_response_cache
+from recipes.images import (InvalidImageError, decode_image_job,
+                            store_renditions)
+from recipes.models import ImageJob, ImageStatus, Recipe
+
+logger = logging.getLogger(__name__)
+
+
+def run_image_job(job):
+    """
+    Выполняет задачу очереди: декодирует и проверяет изображение,
+    создает его варианты и привязывает их к рецепту. Результат
+    устаревшей задачи (для рецепта есть более новая) отбрасывается.
+    """
+    storage = Recipe._meta.get_field('image').storage
+    with decode_image_job(job) as file:
+        original_name, digest = store_renditions(storage, file)
+    Recipe.objects.filter(pk=job.recipe_id).exclude(
+        image_jobs__created__gt=job.created
+    ).update(
+        image=original_name,
+        image_hash=digest,
+        image_status=ImageStatus.READY
+    )
+    recipes_response_cache.invalidate()
+
+
+class Command(BaseCommand):
+    help = 'Обрабатывает очередь загруженных изображений рецептов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Обработать текущую очередь и завершить работу.'
+        )
+        parser.add_argument(
+            '--sleep', type=float, default=settings.IMAGE_JOB_POLL_INTERVAL,
+            help='Пауза в секундах между опросами пустой очереди.'
+        )
+
+    def handle(self, *args, **options):
+        processed = 0
+        while True:
+            close_old_connections()
+            job = ImageJob.objects.claim()
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+                continue
+            try:
+                run_image_job(job)
+            except InvalidImageError as error:
+                ImageJob.objects.fail(job, error, retry=False)
+            except Exception as error:
+                logger.exception('Ошибка обработки задачи %s', job.pk)
+                ImageJob.objects.fail(job, error)
+            else:
+                ImageJob.objects.complete(job)
+                processed += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано изображений: {processed}.'
+        ))
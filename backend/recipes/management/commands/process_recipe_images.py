@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from recipes.images import process_recipe_image
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Создает варианты изображений для еще не обработанных рецептов.'
+
+    def handle(self, *args, **kwargs):
+        processed = 0
+        recipes = Recipe.objects.filter(image_hash='').exclude(image='')
+        for recipe in recipes.iterator():
+            try:
+                process_recipe_image(recipe)
+            except (OSError, ValueError) as error:
+                self.stderr.write(f'Рецепт {recipe.pk}: {error}')
+                continue
+            processed += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано изображений: {processed}.'
+        ))
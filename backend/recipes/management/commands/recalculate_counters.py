@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import (Favorite, Recipe, ShoppingCart,
+                            ShoppingListItem, User)
+from recipes.search import update_search_vector
+
+
+def count_subquery(model, field):
+    """Подзапрос с количеством объектов model для каждой строки."""
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef('pk')}).order_by().values(
+                field
+            ).annotate(total=Count('pk')).values('total'),
+            output_field=IntegerField()
+        ),
+        0
+    )
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает счетчики избранного, списков покупок '
+            'и рецептов пользователей, суммарные списки покупок '
+            'и поисковые векторы рецептов.')
+
+    @transaction.atomic
+    def handle(self, *args, **kwargs):
+        recipes = Recipe.objects.update(
+            favorites_count=count_subquery(Favorite, 'recipe'),
+            cart_count=count_subquery(ShoppingCart, 'recipe')
+        )
+        users = User.objects.update(
+            recipes_count=count_subquery(Recipe, 'author')
+        )
+        items = ShoppingListItem.objects.rebuild()
+        update_search_vector()
+        self.stdout.write(self.style.SUCCESS(
+            f'Счетчики пересчитаны: рецептов - {recipes}, '
+            f'пользователей - {users}, позиций списков покупок - {items}.'
+        ))
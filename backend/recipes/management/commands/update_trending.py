@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from recipes.cache import recipes_response_cache
+from recipes.trending import update_trending
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает рейтинг трендов рецептов с учетом добавлений '
+            'в избранное и списки покупок после прошлого пересчета. '
+            'Предназначена для периодического запуска.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild', action='store_true',
+            help='Пересчитать рейтинг заново, без учета прошлых значений.'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        count = update_trending(options['rebuild'], options['batch_size'])
+        recipes_response_cache.invalidate()
+        self.stdout.write(self.style.SUCCESS(
+            f'Рейтинг трендов обновлен, рецептов с добавлениями: {count}.'
+        ))
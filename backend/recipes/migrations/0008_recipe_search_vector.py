@@ -0,0 +1,61 @@
+# Generated by Django 3.2.3 on 2026-10-18 19:17
+
+import django.contrib.postgres.search
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+INDEX_NAME = 'recipe_search_vector_idx'
+
+
+def create_search_index(apps, schema_editor):
+    """GIN-индекс и заполнение вектора (только PostgreSQL)."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    Recipe = apps.get_model('recipes', 'Recipe')
+    RecipeIngredientsRelated = apps.get_model(
+        'recipes', 'RecipeIngredientsRelated'
+    )
+    schema_editor.execute(
+        f'CREATE INDEX {INDEX_NAME} ON {Recipe._meta.db_table} '
+        'USING gin (search_vector)'
+    )
+    config = settings.RECIPE_SEARCH_CONFIG
+    ingredient_names = RecipeIngredientsRelated.objects.filter(
+        recipe=OuterRef('pk')
+    ).order_by().values('recipe').annotate(
+        names=StringAgg('ingredient__name', ' ')
+    ).values('names')
+    Recipe.objects.update(search_vector=(
+        SearchVector('name', weight='A', config=config)
+        + SearchVector(
+            Coalesce(Subquery(ingredient_names), Value('')),
+            weight='B',
+            config=config
+        )
+        + SearchVector('text', weight='C', config=config)
+    ))
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX IF EXISTS {INDEX_NAME}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_imagejob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
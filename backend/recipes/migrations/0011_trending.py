@@ -0,0 +1,55 @@
+# Generated by Django 3.2.3 on 2026-10-18 19:24
+
+import datetime
+from django.db import migrations, models
+from django.utils.timezone import utc
+
+# Существующие записи получают заведомо старую дату добавления: настоящая
+# неизвестна, и без этого все они попали бы в окно рейтинга трендов.
+CREATED_BEFORE_TRACKING = datetime.datetime(1970, 1, 1, 0, 0, tzinfo=utc)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_recipe_author_pub_date_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('updated', models.DateTimeField(verbose_name='Время пересчета')),
+            ],
+            options={
+                'verbose_name': 'состояние рейтинга трендов',
+                'verbose_name_plural': 'Состояние рейтинга трендов',
+            },
+        ),
+        migrations.AddField(
+            model_name='favorite',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, default=CREATED_BEFORE_TRACKING, verbose_name='Дата добавления'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='trending_score',
+            field=models.FloatField(default=0, editable=False, verbose_name='Рейтинг трендов'),
+        ),
+        migrations.AddField(
+            model_name='shoppingcart',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, default=CREATED_BEFORE_TRACKING, verbose_name='Дата добавления'),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-favorites_count', '-id'], name='recipe_popular_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-trending_score', '-id'], name='recipe_trending_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 3.2.3 on 2026-10-18 20:04
+
+from django.db import migrations, models
+import recipes.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_trending'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='shoppingcart',
+            name='recipe',
+            field=models.ForeignKey(on_delete=recipes.models.cascade_recipe_carts, related_name='shopping_cart', to='recipes.recipe', verbose_name='Рецепт'),
+        ),
+    ]
@@ -1,8 +1,16 @@
+from datetime import timedelta
+
 from colorfield.fields import ColorField
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import connection, models, transaction
+from django.utils import timezone
+
+from recipes.cache import recipes_response_cache
+from recipes.images import ORIGINAL, rendition_name
+from users.models import CounterFieldsMixin, Follow
 
 User = get_user_model()
 
@@ -76,22 +84,95 @@ class Ingredient(models.Model):
         return self.name
 
 
+class ImageStatus(models.TextChoices):
+    """Состояния обработки изображения рецепта."""
+
+    PENDING = 'pending', 'Обрабатывается'
+    READY = 'ready', 'Готово'
+    FAILED = 'failed', 'Ошибка обработки'
+
+
 class RecipeManager(models.Manager):
     """Менеджер для модели рецептов, добавляющий новый метод аннотации."""
 
     def custom_annotate(self, user):
-        """Аннотирует объект полями избранное и в списке покупок."""
-        is_favorited = user.favorites.filter(recipe=models.OuterRef('pk'))
-        is_in_shopping_cart = user.shopping_cart.filter(
-            recipe=models.OuterRef('pk')
-        )
-        return self.get_queryset().annotate(
-            is_favorited=models.Exists(is_favorited),
-            is_in_shopping_cart=models.Exists(is_in_shopping_cart)
-        ).order_by('-pub_date')
-
-
-class Recipe(models.Model):
+        """
+        Аннотирует объект полями избранное и в списке покупок и
+        подгружает связанные объекты, необходимые для чтения рецептов.
+
+        Количество запросов не зависит от числа рецептов на странице:
+        авторы, теги и ингредиенты загружаются отдельными запросами.
+        """
+        authors = User.objects.all()
+        if user.is_authenticated:
+            is_favorited = models.Exists(
+                user.favorites.filter(recipe=models.OuterRef('pk'))
+            )
+            is_in_shopping_cart = models.Exists(
+                user.shopping_cart.filter(recipe=models.OuterRef('pk'))
+            )
+            authors = authors.annotate(is_subscribed=models.Exists(
+                Follow.objects.filter(
+                    user=user, following=models.OuterRef('pk')
+                )
+            ))
+        else:
+            is_favorited = is_in_shopping_cart = models.Value(
+                False, output_field=models.BooleanField()
+            )
+        return self.get_queryset().defer('search_vector').annotate(
+            is_favorited=is_favorited,
+            is_in_shopping_cart=is_in_shopping_cart
+        ).prefetch_related(
+            models.Prefetch('author', queryset=authors),
+            'tags',
+            models.Prefetch(
+                'ingredients_list',
+                queryset=RecipeIngredientsRelated.objects.select_related(
+                    'ingredient'
+                ).order_by('ingredient__name', 'ingredient__measurement_unit')
+            )
+        ).order_by('-pub_date', '-id')
+
+    def latest_by_author(self, author_ids, limit=None):
+        """
+        Возвращает словарь {id автора: список последних рецептов}.
+
+        Рецепты всех авторов загружаются одним запросом, при заданном
+        limit - не более limit рецептов на автора через ROW_NUMBER().
+        Поисковый вектор не загружается.
+        """
+        recipes = {author_id: [] for author_id in author_ids}
+        if not author_ids or limit == 0:
+            return recipes
+        if limit is None:
+            queryset = self.filter(author__in=author_ids).defer(
+                'search_vector'
+            ).order_by('-pub_date', '-id')
+        else:
+            placeholders = ', '.join(['%s'] * len(author_ids))
+            columns = ', '.join(
+                connection.ops.quote_name(field.column)
+                for field in self.model._meta.concrete_fields
+                if field.name != 'search_vector'
+            )
+            queryset = self.raw(
+                f'SELECT {columns} FROM ('
+                f'SELECT {columns}, ROW_NUMBER() OVER ('
+                'PARTITION BY author_id ORDER BY pub_date DESC, id DESC'
+                ') AS row_number '
+                f'FROM {self.model._meta.db_table} '
+                f'WHERE author_id IN ({placeholders})'
+                ') AS ranked WHERE row_number <= %s '
+                'ORDER BY pub_date DESC, id DESC',
+                [*author_ids, limit]
+            )
+        for recipe in queryset:
+            recipes[recipe.author_id].append(recipe)
+        return recipes
+
+
+class Recipe(CounterFieldsMixin, models.Model):
     """Модель для рецептов."""
 
     name = models.CharField(
@@ -102,8 +183,22 @@ class Recipe(models.Model):
     image = models.ImageField(
         'Изображение',
         upload_to='recipes/images/',
+        blank=True,
         help_text='Обязательное. Добавьте изображение рецепта.'
     )
+    image_status = models.CharField(
+        'Состояние изображения',
+        max_length=10,
+        choices=ImageStatus.choices,
+        default=ImageStatus.READY,
+        editable=False
+    )
+    image_hash = models.CharField(
+        'Хэш изображения',
+        max_length=64,
+        blank=True,
+        editable=False
+    )
     tags = models.ManyToManyField(
         Tag,
         related_name='recipes',
@@ -137,16 +232,74 @@ class Recipe(models.Model):
         'Дата публикации',
         auto_now_add=True
     )
+    favorites_count = models.PositiveIntegerField(
+        'Количество добавлений в избранное',
+        default=0,
+        editable=False
+    )
+    cart_count = models.PositiveIntegerField(
+        'Количество добавлений в список покупок',
+        default=0,
+        editable=False
+    )
+    search_vector = SearchVectorField(
+        'Поисковый вектор',
+        null=True,
+        editable=False
+    )
+    trending_score = models.FloatField(
+        'Рейтинг трендов',
+        default=0,
+        editable=False
+    )
     objects = RecipeManager()
 
+    counter_fields = ('favorites_count', 'cart_count', 'trending_score')
+    # Поля изображения записывают только очередь обработки и ее воркер.
+    image_fields = ('image', 'image_hash', 'image_status')
+
     class Meta:
         verbose_name = 'рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ('-pub_date',)
+        indexes = [
+            models.Index(
+                fields=('-pub_date', '-id'), name='recipe_pub_date_id_idx'
+            ),
+            models.Index(
+                fields=('author', '-pub_date', '-id'),
+                name='recipe_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=('-favorites_count', '-id'),
+                name='recipe_popular_idx'
+            ),
+            models.Index(
+                fields=('-trending_score', '-id'),
+                name='recipe_trending_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
+    def get_image_url(self, rendition=ORIGINAL):
+        """
+        Возвращает URL варианта изображения. Для изображений,
+        еще не прошедших обработку, возвращает исходный файл.
+        """
+        if not self.image:
+            return None
+        if not self.image_hash:
+            return self.image.url
+        return self.image.storage.url(
+            rendition_name(self.image.name, rendition)
+        )
+
+    def get_ingredient_amounts(self):
+        """Возвращает словарь {id ингредиента: количество} рецепта."""
+        return dict(self.ingredients_list.values_list('ingredient', 'amount'))
+
 
 class RecipeIngredientsRelated(models.Model):
     """Модель для связи ManyToMany моделей ингредиентов и рецептов."""
@@ -177,6 +330,22 @@ class RecipeIngredientsRelated(models.Model):
                 name='unique_recipe_ingredient'
             ),
         ]
+        indexes = [
+            models.Index(
+                fields=('ingredient', 'recipe'),
+                name='ingredient_recipe_idx'
+            ),
+        ]
+
+
+def cascade_recipe_carts(collector, field, sub_objs, using):
+    """
+    CASCADE, отмечающий корзины удаляемого рецепта: списки покупок
+    их пользователей обновляет один обработчик удаления рецепта.
+    """
+    for cart in sub_objs:
+        cart.recipe_deleted = True
+    models.CASCADE(collector, field, sub_objs, using)
 
 
 class AbstractUserRecipeModel(models.Model):
@@ -192,6 +361,11 @@ class AbstractUserRecipeModel(models.Model):
         on_delete=models.CASCADE,
         verbose_name='Рецепт'
     )
+    created = models.DateTimeField(
+        'Дата добавления',
+        auto_now_add=True,
+        db_index=True
+    )
 
     class Meta:
         abstract = True
@@ -216,6 +390,12 @@ class Favorite(AbstractUserRecipeModel):
 class ShoppingCart(AbstractUserRecipeModel):
     """Модель для списка покупок."""
 
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=cascade_recipe_carts,
+        verbose_name='Рецепт'
+    )
+
     class Meta:
         default_related_name = 'shopping_cart'
         verbose_name = 'корзина покупок'
@@ -227,3 +407,258 @@ class ShoppingCart(AbstractUserRecipeModel):
                 name='unique_user_shopping_cart'
             ),
         ]
+
+
+class ShoppingListManager(models.Manager):
+    """Менеджер для инкрементального обновления списков покупок."""
+
+    @transaction.atomic
+    def apply_changes(self, user_ids, changes):
+        """
+        Прибавляет изменения changes ({id ингредиента: количество})
+        к суммарному количеству ингредиентов пользователей user_ids.
+        Позиции с нулевым количеством удаляются.
+        """
+        changes = {
+            ingredient: amount for ingredient, amount in changes.items()
+            if amount
+        }
+        user_ids = sorted(set(user_ids))
+        if not changes or not user_ids:
+            return
+        # Блокировка пользователей исключает гонку при создании позиций.
+        list(User.objects.select_for_update().filter(
+            pk__in=user_ids
+        ).order_by('pk').values_list('pk'))
+        items = {
+            (item.user_id, item.ingredient_id): item
+            for item in self.filter(user__in=user_ids, ingredient__in=changes)
+        }
+        to_create, to_update, to_delete = [], [], []
+        for user_id in user_ids:
+            for ingredient_id, amount in changes.items():
+                item = items.get((user_id, ingredient_id))
+                if item is None:
+                    if amount > 0:
+                        to_create.append(self.model(
+                            user_id=user_id,
+                            ingredient_id=ingredient_id,
+                            total_amount=amount
+                        ))
+                    continue
+                item.total_amount += amount
+                if item.total_amount > 0:
+                    to_update.append(item)
+                else:
+                    to_delete.append(item.pk)
+        self.bulk_create(to_create)
+        self.bulk_update(to_update, ('total_amount',))
+        self.filter(pk__in=to_delete).delete()
+
+    def apply_recipe_changes(self, recipe, old_amounts, new_amounts=None):
+        """
+        Учитывает изменение ингредиентов рецепта в списках покупок
+        всех пользователей, добавивших рецепт в корзину.
+        """
+        if new_amounts is None:
+            new_amounts = recipe.get_ingredient_amounts()
+        self.apply_recipe_delta(recipe, {
+            ingredient: (new_amounts.get(ingredient, 0)
+                         - old_amounts.get(ingredient, 0))
+            for ingredient in old_amounts.keys() | new_amounts.keys()
+        })
+
+    def apply_recipe_delta(self, recipe, changes):
+        """
+        Прибавляет изменения ингредиентов рецепта changes
+        ({id ингредиента: разница}) к спискам покупок.
+        """
+        if any(changes.values()):
+            self.apply_changes(
+                recipe.shopping_cart.values_list('user', flat=True), changes
+            )
+
+    @transaction.atomic
+    def rebuild(self):
+        """Полностью пересчитывает списки покупок по корзинам."""
+        self.all().delete()
+        totals = RecipeIngredientsRelated.objects.filter(
+            recipe__shopping_cart__isnull=False
+        ).values(
+            'recipe__shopping_cart__user', 'ingredient'
+        ).order_by().annotate(total=models.Sum('amount'))
+        return len(self.bulk_create(
+            (self.model(
+                user_id=item['recipe__shopping_cart__user'],
+                ingredient_id=item['ingredient'],
+                total_amount=item['total']
+            ) for item in totals.iterator()),
+            batch_size=1000
+        ))
+
+
+class ShoppingListItem(models.Model):
+    """
+    Модель для суммарного количества ингредиентов
+    из всех рецептов списка покупок пользователя.
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Пользователь'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items',
+        verbose_name='Ингредиент'
+    )
+    total_amount = models.PositiveIntegerField('Суммарное количество')
+    objects = ShoppingListManager()
+
+    class Meta:
+        verbose_name = 'позиция списка покупок'
+        verbose_name_plural = 'Списки покупок'
+        ordering = ('user', 'ingredient')
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='unique_user_shopping_list_ingredient'
+            ),
+        ]
+
+
+class ImageJobManager(models.Manager):
+    """Менеджер очереди задач обработки изображений."""
+
+    @transaction.atomic
+    def enqueue(self, recipe, source, encoding):
+        """
+        Ставит в очередь обработку загруженного файла source для рецепта.
+        Еще не начатые задачи этого рецепта становятся неактуальными.
+        """
+        self.filter(recipe=recipe, status=ImageJob.Status.PENDING).delete()
+        Recipe.objects.filter(pk=recipe.pk).update(
+            image_status=ImageStatus.PENDING
+        )
+        recipe.image_status = ImageStatus.PENDING
+        job = self.model(recipe=recipe, encoding=encoding)
+        job.source.save(source.name, source, save=False)
+        job.save()
+        return job
+
+    def claim(self):
+        """
+        Захватывает самую старую ожидающую задачу. Задачи, зависшие в
+        обработке дольше IMAGE_JOB_TIMEOUT секунд, захватываются повторно,
+        пока не исчерпаны IMAGE_JOB_MAX_ATTEMPTS попыток, а затем
+        помечаются как ошибочные.
+        """
+        stale = timezone.now() - timedelta(
+            seconds=settings.IMAGE_JOB_TIMEOUT
+        )
+        stale_jobs = models.Q(
+            status=ImageJob.Status.PROCESSING, updated__lt=stale
+        )
+        with transaction.atomic():
+            for job in self.select_for_update(skip_locked=True).filter(
+                stale_jobs, attempts__gte=settings.IMAGE_JOB_MAX_ATTEMPTS
+            ):
+                self.fail(job, 'Превышено время обработки.', retry=False)
+        with transaction.atomic():
+            job = self.select_for_update(skip_locked=True).filter(
+                models.Q(status=ImageJob.Status.PENDING)
+                | stale_jobs & models.Q(
+                    attempts__lt=settings.IMAGE_JOB_MAX_ATTEMPTS
+                )
+            ).order_by('created').first()
+            if job is None:
+                return None
+            job.status = ImageJob.Status.PROCESSING
+            job.attempts += 1
+            job.save(update_fields=('status', 'attempts', 'updated'))
+        return job
+
+    def complete(self, job):
+        job.delete()
+
+    def fail(self, job, error, retry=True):
+        """
+        Возвращает задачу в очередь или, если попытки исчерпаны,
+        помечает ее как ошибочную и удаляет загруженный файл. Изображение
+        рецепта помечается ошибочным, только если для рецепта нет более
+        новой задачи.
+        """
+        job.error = str(error)
+        if retry and job.attempts < settings.IMAGE_JOB_MAX_ATTEMPTS:
+            job.status = ImageJob.Status.PENDING
+        else:
+            job.status = ImageJob.Status.FAILED
+            job.source.delete(save=False)
+            if Recipe.objects.filter(pk=job.recipe_id).exclude(
+                image_jobs__created__gt=job.created
+            ).update(image_status=ImageStatus.FAILED):
+                recipes_response_cache.invalidate()
+        job.save(update_fields=('status', 'error', 'source', 'updated'))
+
+
+class ImageJob(models.Model):
+    """Модель для задач фоновой обработки изображений рецептов."""
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Ожидает'
+        PROCESSING = 'processing', 'Обрабатывается'
+        FAILED = 'failed', 'Ошибка'
+
+    class Encoding(models.TextChoices):
+        BASE64 = 'base64', 'base64'
+        BINARY = 'binary', 'Двоичный файл'
+
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='image_jobs',
+        verbose_name='Рецепт'
+    )
+    source = models.FileField('Загруженный файл', upload_to='recipes/uploads/')
+    encoding = models.CharField(
+        'Кодировка файла',
+        max_length=10,
+        choices=Encoding.choices
+    )
+    status = models.CharField(
+        'Статус',
+        max_length=10,
+        choices=Status.choices,
+        default=Status.PENDING
+    )
+    attempts = models.PositiveSmallIntegerField('Попытки', default=0)
+    error = models.TextField('Ошибка', blank=True)
+    created = models.DateTimeField('Создана', auto_now_add=True)
+    updated = models.DateTimeField('Обновлена', auto_now=True)
+    objects = ImageJobManager()
+
+    class Meta:
+        verbose_name = 'задача обработки изображения'
+        verbose_name_plural = 'Задачи обработки изображений'
+        ordering = ('created',)
+        indexes = [
+            models.Index(
+                fields=('status', 'created'), name='image_job_status_idx'
+            ),
+        ]
+
+
+class TrendingState(models.Model):
+    """Модель с временем последнего пересчета рейтинга трендов."""
+
+    updated = models.DateTimeField('Время пересчета')
+
+    class Meta:
+        verbose_name = 'состояние рейтинга трендов'
+        verbose_name_plural = 'Состояние рейтинга трендов'
+
+    def __str__(self):
+        return f'Пересчет {self.updated}'
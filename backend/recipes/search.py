@@ -0,0 +1,108 @@
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db import connection
+from django.db.models import (Count, ExpressionWrapper, F, FloatField,
+                              OuterRef, Q, Subquery, Value)
+from django.db.models.functions import Cast, Coalesce
+
+from recipes.models import Recipe, RecipeIngredientsRelated
+
+
+def is_full_text_supported():
+    """Полнотекстовый поиск доступен только в PostgreSQL."""
+    return connection.vendor == 'postgresql'
+
+
+def search_vector():
+    """
+    Поисковый вектор рецепта: название (вес A), названия ингредиентов
+    (вес B) и описание (вес C).
+    """
+    config = settings.RECIPE_SEARCH_CONFIG
+    ingredient_names = RecipeIngredientsRelated.objects.filter(
+        recipe=OuterRef('pk')
+    ).order_by().values('recipe').annotate(
+        names=StringAgg('ingredient__name', ' ')
+    ).values('names')
+    return (
+        SearchVector('name', weight='A', config=config)
+        + SearchVector(
+            Coalesce(Subquery(ingredient_names), Value('')),
+            weight='B',
+            config=config
+        )
+        + SearchVector('text', weight='C', config=config)
+    )
+
+
+def update_search_vector(recipes=None):
+    """
+    Пересчитывает поисковый вектор рецептов recipes (id, queryset
+    или список id; None - все рецепты). Вызывается явно после изменения
+    рецепта и его ингредиентов, так как сигнал post_save рецепта
+    срабатывает до сохранения ингредиентов.
+    """
+    if not is_full_text_supported():
+        return 0
+    queryset = Recipe.objects.all()
+    if recipes is not None:
+        if isinstance(recipes, int):
+            recipes = [recipes]
+        queryset = queryset.filter(pk__in=recipes)
+    return queryset.update(search_vector=search_vector())
+
+
+def search_recipes(queryset, text, rank=True):
+    """
+    Фильтрует рецепты по поисковой строке. В PostgreSQL используется
+    индекс по search_vector и сортировка по релевантности, в остальных
+    СУБД (SQLite для разработки) - поиск подстроки.
+    """
+    text = text.strip()
+    if not text:
+        return queryset
+    if not is_full_text_supported():
+        return queryset.filter(
+            Q(name__icontains=text)
+            | Q(text__icontains=text)
+            | Q(pk__in=RecipeIngredientsRelated.objects.filter(
+                ingredient__name__icontains=text
+            ).values('recipe'))
+        )
+    query = SearchQuery(
+        text, config=settings.RECIPE_SEARCH_CONFIG, search_type='websearch'
+    )
+    queryset = queryset.filter(search_vector=query)
+    if not rank:
+        return queryset
+    return queryset.annotate(
+        rank=SearchRank(F('search_vector'), query)
+    ).order_by('-rank', *queryset.query.order_by)
+
+
+def cookable_recipes(queryset, ingredient_ids):
+    """
+    Рецепты, в которых есть хотя бы один из ингредиентов ingredient_ids,
+    с долей покрытия coverage - частью ингредиентов рецепта, входящих
+    в ingredient_ids. Рецепты-кандидаты выбираются по индексу
+    (ingredient, recipe), покрытие считается одним сгруппированным
+    запросом.
+    """
+    candidates = RecipeIngredientsRelated.objects.filter(
+        ingredient__in=ingredient_ids
+    ).values('recipe')
+    return queryset.filter(pk__in=candidates).annotate(
+        ingredients_total=Count('ingredients_list'),
+        ingredients_matched=Count(
+            'ingredients_list',
+            filter=Q(ingredients_list__ingredient__in=ingredient_ids)
+        )
+    ).annotate(
+        coverage=ExpressionWrapper(
+            Cast('ingredients_matched', FloatField())
+            / F('ingredients_total'),
+            output_field=FloatField()
+        )
+    ).order_by('-coverage', '-ingredients_matched', '-pub_date', '-id')
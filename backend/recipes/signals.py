@@ -0,0 +1,190 @@
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete, pre_save)
+from django.dispatch import receiver
+
+from recipes.cache import ingredients_cache, recipes_response_cache, tags_cache
+from recipes.feed import feed_timelines
+from recipes.models import (Favorite, ImageJob, Ingredient, Recipe,
+                            RecipeIngredientsRelated, ShoppingCart,
+                            ShoppingListItem, Tag, User)
+from recipes.search import update_search_vector
+from users.models import Follow
+
+# Поля автора, которые выводятся в ответах с рецептами.
+AUTHOR_FIELDS = ('email', 'username', 'first_name', 'last_name')
+
+COUNTER_FIELDS = {
+    Favorite: 'favorites_count',
+    ShoppingCart: 'cart_count',
+}
+
+
+def change_counter(queryset, field, delta):
+    """Изменяет счетчик на уровне БД без чтения объекта."""
+    queryset.update(**{field: F(field) + delta})
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+def increase_recipe_counter(sender, instance, created, **kwargs):
+    if created:
+        change_counter(
+            Recipe.objects.filter(pk=instance.recipe_id),
+            COUNTER_FIELDS[sender],
+            1
+        )
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+def decrease_recipe_counter(sender, instance, **kwargs):
+    if getattr(instance, 'recipe_deleted', False):
+        return
+    field = COUNTER_FIELDS[sender]
+    change_counter(
+        Recipe.objects.filter(pk=instance.recipe_id, **{f'{field}__gt': 0}),
+        field,
+        -1
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def increase_author_counter(sender, instance, created, **kwargs):
+    if created:
+        change_counter(
+            User.objects.filter(pk=instance.author_id), 'recipes_count', 1
+        )
+
+
+@receiver(post_delete, sender=Recipe)
+def decrease_author_counter(sender, instance, **kwargs):
+    change_counter(
+        User.objects.filter(pk=instance.author_id, recipes_count__gt=0),
+        'recipes_count',
+        -1
+    )
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_tags_cache(sender, **kwargs):
+    tags_cache.invalidate()
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_ingredients_cache(sender, **kwargs):
+    ingredients_cache.invalidate()
+
+
+@receiver(post_save, sender=Ingredient)
+def update_recipes_search_vector(sender, instance, created, **kwargs):
+    if not created:
+        update_search_vector(instance.recipes.values('recipe'))
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=RecipeIngredientsRelated)
+@receiver(post_delete, sender=RecipeIngredientsRelated)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_recipes_response_cache(sender, **kwargs):
+    recipes_response_cache.invalidate()
+
+
+@receiver(pre_save, sender=User)
+def detect_author_changes(sender, instance, update_fields=None, **kwargs):
+    """
+    Отмечает изменение полей автора, которые выводятся в ответах
+    с рецептами. Сохранения других полей (например, last_login при
+    входе) кэш ответов не сбрасывают.
+    """
+    instance.author_fields_changed = False
+    fields = set(AUTHOR_FIELDS)
+    if update_fields is not None:
+        fields &= set(update_fields)
+    if not fields or instance.pk is None or not instance.recipes_count:
+        return
+    saved = User.objects.filter(pk=instance.pk).values(*fields).first()
+    instance.author_fields_changed = saved is not None and any(
+        saved[field] != getattr(instance, field) for field in fields
+    )
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_responses(sender, instance, **kwargs):
+    if getattr(instance, 'author_fields_changed', False):
+        recipes_response_cache.invalidate()
+
+
+@receiver(post_save, sender=Recipe)
+def push_to_feeds(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: feed_timelines.push(instance))
+
+
+@receiver(post_delete, sender=Recipe)
+def remove_from_feeds(sender, instance, **kwargs):
+    author_id, recipe_id = instance.author_id, instance.pk
+    transaction.on_commit(
+        lambda: feed_timelines.remove(author_id, recipe_id)
+    )
+
+
+@receiver(post_delete, sender=ImageJob)
+def delete_image_job_source(sender, instance, **kwargs):
+    """Удаляет загруженный файл задачи, в том числе при удалении рецепта."""
+    source = instance.source
+    if source:
+        storage, name = source.storage, source.name
+        transaction.on_commit(lambda: storage.delete(name))
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_feed(sender, instance, **kwargs):
+    user_id = instance.user_id
+    transaction.on_commit(lambda: feed_timelines.invalidate(user_id))
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_to_shopping_list(sender, instance, created, **kwargs):
+    if created:
+        ShoppingListItem.objects.apply_changes(
+            (instance.user_id,), instance.recipe.get_ingredient_amounts()
+        )
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def remove_from_shopping_list(sender, instance, **kwargs):
+    """
+    Срабатывает до удаления, пока ингредиенты рецепта еще существуют:
+    при каскадном удалении рецепта они могут быть удалены раньше корзины.
+    Корзины удаляемого рецепта учитывает remove_recipe_from_shopping_lists.
+    """
+    if getattr(instance, 'recipe_deleted', False):
+        return
+    amounts = instance.recipe.get_ingredient_amounts()
+    ShoppingListItem.objects.apply_changes(
+        (instance.user_id,),
+        {ingredient: -amount for ingredient, amount in amounts.items()}
+    )
+
+
+@receiver(pre_delete, sender=Recipe)
+def remove_recipe_from_shopping_lists(sender, instance, **kwargs):
+    """
+    Одним обновлением убирает удаляемый рецепт из списков покупок
+    всех пользователей, добавивших его в корзину.
+    """
+    amounts = instance.get_ingredient_amounts()
+    ShoppingListItem.objects.apply_recipe_delta(
+        instance,
+        {ingredient: -amount for ingredient, amount in amounts.items()}
+    )
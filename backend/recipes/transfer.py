@@ -0,0 +1,441 @@
+"""
+Потоковый импорт и экспорт данных (команды import_data и export_data).
+
+Файлы читаются и пишутся по одной записи, в базу данные попадают
+пакетами. Поддерживаются форматы csv, json (массив объектов) и ndjson
+(объект на строку). Связи описываются естественными ключами: пользователи
+- email, теги - slug, ингредиенты - название и единица измерения,
+рецепты - id. Вложенные значения (теги и ингредиенты рецепта) в csv
+хранятся строкой JSON.
+"""
+import csv
+import json
+from datetime import datetime
+from itertools import islice
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from recipes.models import (Favorite, Ingredient, Recipe,
+                            RecipeIngredientsRelated, ShoppingCart, Tag)
+from users.models import Follow, User
+
+FORMATS = ('csv', 'json', 'ndjson')
+# Дата добавления в избранное и список покупок, если она неизвестна.
+CREATED_BEFORE_TRACKING = datetime(1970, 1, 1, tzinfo=timezone.utc)
+READ_SIZE = 64 * 1024
+
+
+def batches(iterable, size):
+    """Разбивает поток на списки длиной не более size."""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def read_json_array(file):
+    """Читает элементы JSON-массива, не загружая файл целиком."""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    started = False
+    while True:
+        stripped = buffer.lstrip()
+        if not started and stripped.startswith('['):
+            stripped, started = stripped[1:].lstrip(), True
+        if started and stripped.startswith(','):
+            stripped = stripped[1:].lstrip()
+        if started and stripped.startswith(']'):
+            return
+        buffer = stripped
+        if started and buffer:
+            try:
+                item, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                pass
+            else:
+                buffer = buffer[end:]
+                yield item
+                continue
+        chunk = file.read(READ_SIZE)
+        if not chunk:
+            raise ValueError('Файл не является JSON-массивом объектов.')
+        buffer += chunk
+
+
+def read_records(file, file_format, entity):
+    """Возвращает поток записей (словарей) из файла."""
+    if file_format == 'json':
+        yield from read_json_array(file)
+    elif file_format == 'ndjson':
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+    else:
+        for record in csv.DictReader(file):
+            for field in entity.nested_fields:
+                record[field] = json.loads(record[field] or '[]')
+            yield record
+
+
+def write_records(file, file_format, entity, records):
+    """Записывает поток записей в файл, возвращает их количество."""
+    count = 0
+    if file_format == 'csv':
+        writer = csv.DictWriter(file, fieldnames=entity.fields)
+        writer.writeheader()
+    elif file_format == 'json':
+        file.write('[')
+    for record in records:
+        if file_format == 'csv':
+            for field in entity.nested_fields:
+                record[field] = json.dumps(record[field], ensure_ascii=False)
+            writer.writerow(record)
+        else:
+            data = json.dumps(
+                record, cls=DjangoJSONEncoder, ensure_ascii=False
+            )
+            if file_format == 'json':
+                file.write((',\n' if count else '\n') + data)
+            else:
+                file.write(data + '\n')
+        count += 1
+    if file_format == 'json':
+        file.write('\n]\n')
+    return count
+
+
+def upsert(model, objects, key_fields, update_fields=()):
+    """
+    Создает объекты, которых еще нет в базе, и обновляет поля
+    update_fields у существующих (совпадение по key_fields).
+
+    В Django 3.2 у bulk_create нет update_conflicts, поэтому существующие
+    строки выбираются одним запросом и обновляются через bulk_update,
+    а вставка выполняется с ignore_conflicts.
+    Возвращает количество созданных и обновленных объектов.
+    """
+    def key(obj):
+        return tuple(getattr(obj, field) for field in key_fields)
+
+    # Кандидаты выбираются по первому полю ключа, полный ключ
+    # сравнивается уже в Python.
+    existing = {
+        key(obj): obj.pk for obj in model.objects.filter(**{
+            f'{key_fields[0]}__in': {key(obj)[0] for obj in objects}
+        }).only('pk', *key_fields)
+    }
+    to_create, to_update = [], []
+    for obj in objects:
+        pk = existing.get(key(obj))
+        if pk is None:
+            to_create.append(obj)
+        elif update_fields:
+            obj.pk = pk
+            to_update.append(obj)
+    model.objects.bulk_create(to_create, ignore_conflicts=True)
+    if to_update:
+        model.objects.bulk_update(to_update, update_fields)
+    return len(to_create), len(to_update)
+
+
+class Entity:
+    """
+    Тип данных для импорта и экспорта: поля записи, выборка
+    для экспорта и загрузка пакета записей.
+    """
+
+    name = None
+    model = None
+    fields = ()
+    nested_fields = ()
+
+    def queryset(self):
+        return self.model.objects.all()
+
+    def export(self, batch_size):
+        """Поток записей, выбираемых пакетами по первичному ключу."""
+        last_pk = 0
+        while True:
+            batch = list(self.queryset().filter(
+                pk__gt=last_pk
+            ).order_by('pk')[:batch_size])
+            for obj in batch:
+                yield self.to_record(obj)
+            if len(batch) < batch_size:
+                return
+            last_pk = batch[-1].pk
+
+    def to_record(self, obj):
+        return {field: getattr(obj, field) for field in self.fields}
+
+    def clean(self, record, fields=None):
+        """Приводит значения полей fields записи к типам полей модели."""
+        return {
+            field: self.model._meta.get_field(field).to_python(record[field])
+            for field in fields or self.fields
+        }
+
+    def load(self, records):
+        """Сохраняет пакет записей, возвращает (создано, обновлено)."""
+        raise NotImplementedError
+
+
+class TagEntity(Entity):
+    name = 'tags'
+    model = Tag
+    fields = ('name', 'color', 'slug')
+
+    def load(self, records):
+        return upsert(
+            Tag,
+            [Tag(**self.clean(record)) for record in records],
+            ('slug',),
+            ('name', 'color')
+        )
+
+
+class IngredientEntity(Entity):
+    name = 'ingredients'
+    model = Ingredient
+    fields = ('name', 'measurement_unit')
+
+    def load(self, records):
+        return upsert(
+            Ingredient,
+            [Ingredient(**self.clean(record)) for record in records],
+            ('name', 'measurement_unit')
+        )
+
+
+class UserEntity(Entity):
+    name = 'users'
+    model = User
+    fields = ('email', 'username', 'first_name', 'last_name', 'password',
+              'is_active')
+
+    def load(self, records):
+        return upsert(
+            User,
+            [User(**self.clean(record)) for record in records],
+            ('email',),
+            ('username', 'first_name', 'last_name', 'password', 'is_active')
+        )
+
+
+def resolve(mapping, key, description):
+    """Возвращает id объекта по естественному ключу."""
+    try:
+        return mapping[key]
+    except KeyError:
+        raise ValueError(f'Не найден {description}: {key}.')
+
+
+def users_by_email(emails):
+    return dict(User.objects.filter(
+        email__in=set(emails)
+    ).values_list('email', 'pk'))
+
+
+class RecipeEntity(Entity):
+    name = 'recipes'
+    model = Recipe
+    fields = ('id', 'author', 'name', 'text', 'cooking_time', 'image',
+              'image_hash', 'pub_date', 'tags', 'ingredients')
+    nested_fields = ('tags', 'ingredients')
+    model_fields = ('id', 'name', 'text', 'cooking_time', 'image',
+                    'image_hash', 'pub_date')
+    update_fields = ('author', 'name', 'text', 'cooking_time', 'image',
+                     'image_hash', 'pub_date')
+
+    def queryset(self):
+        return Recipe.objects.select_related('author').prefetch_related(
+            'tags', 'ingredients_list__ingredient'
+        )
+
+    def to_record(self, obj):
+        return {
+            'id': obj.id,
+            'author': obj.author.email,
+            'name': obj.name,
+            'text': obj.text,
+            'cooking_time': obj.cooking_time,
+            'image': obj.image.name,
+            'image_hash': obj.image_hash,
+            'pub_date': obj.pub_date.isoformat(),
+            'tags': [tag.slug for tag in obj.tags.all()],
+            'ingredients': [
+                {
+                    'name': item.ingredient.name,
+                    'measurement_unit': item.ingredient.measurement_unit,
+                    'amount': item.amount,
+                }
+                for item in obj.ingredients_list.all()
+            ],
+        }
+
+    @staticmethod
+    def ingredients_by_key(records):
+        names = {
+            item['name']
+            for record in records for item in record['ingredients']
+        }
+        return {
+            (name, measurement_unit): pk
+            for pk, name, measurement_unit in Ingredient.objects.filter(
+                name__in=names
+            ).values_list('pk', 'name', 'measurement_unit')
+        }
+
+    def load(self, records):
+        authors = users_by_email(record['author'] for record in records)
+        tags = dict(Tag.objects.values_list('slug', 'pk'))
+        ingredients = self.ingredients_by_key(records)
+        recipes = []
+        for record in records:
+            recipe = Recipe(**self.clean(record, self.model_fields))
+            recipe.author_id = resolve(
+                authors, record['author'], 'пользователь'
+            )
+            recipes.append(recipe)
+        # bulk_create подставляет текущее время в поле с auto_now_add,
+        # поэтому дата публикации восстанавливается отдельным обновлением.
+        pub_dates = [recipe.pub_date for recipe in recipes]
+        created, updated = upsert(
+            Recipe, recipes, ('id',), self.update_fields
+        )
+        for recipe, pub_date in zip(recipes, pub_dates):
+            recipe.pub_date = pub_date
+        Recipe.objects.bulk_update(recipes, ('pub_date',))
+
+        Recipe.tags.through.objects.filter(recipe__in=recipes).delete()
+        RecipeIngredientsRelated.objects.filter(recipe__in=recipes).delete()
+        Recipe.tags.through.objects.bulk_create([
+            Recipe.tags.through(
+                recipe_id=recipe.id, tag_id=resolve(tags, slug, 'тег')
+            )
+            for recipe, record in zip(recipes, records)
+            for slug in record['tags']
+        ])
+        RecipeIngredientsRelated.objects.bulk_create([
+            RecipeIngredientsRelated(
+                recipe_id=recipe.id,
+                ingredient_id=resolve(
+                    ingredients,
+                    (item['name'], item['measurement_unit']),
+                    'ингредиент'
+                ),
+                amount=item['amount']
+            )
+            for recipe, record in zip(recipes, records)
+            for item in record['ingredients']
+        ])
+        return created, updated
+
+
+class UserRecipeEntity(Entity):
+    """
+    Избранное и списки покупок: пары пользователь - рецепт с датой
+    добавления. Новым записям без даты (выгрузки старых версий)
+    ставится та же заведомо старая дата, что и при миграции 0011:
+    иначе весь импорт попал бы в окно рейтинга трендов как новые
+    добавления.
+    """
+
+    fields = ('user', 'recipe', 'created')
+
+    def queryset(self):
+        return self.model.objects.select_related('user')
+
+    def to_record(self, obj):
+        return {
+            'user': obj.user.email,
+            'recipe': obj.recipe_id,
+            'created': obj.created.isoformat(),
+        }
+
+    def load(self, records):
+        users = users_by_email(record['user'] for record in records)
+        field = self.model._meta.get_field('created')
+        objects, dates = [], {}
+        for record in records:
+            obj = self.model(
+                user_id=resolve(users, record['user'], 'пользователь'),
+                recipe_id=int(record['recipe'])
+            )
+            objects.append(obj)
+            dates[(obj.user_id, obj.recipe_id)] = (
+                field.to_python(record['created'])
+                if record.get('created') else None
+            )
+        # bulk_create подставляет текущее время в поле с auto_now_add,
+        # поэтому дата добавления восстанавливается отдельным обновлением.
+        started = timezone.now()
+        result = upsert(self.model, objects, ('user_id', 'recipe_id'))
+        saved = self.model.objects.filter(
+            user_id__in={user for user, _ in dates},
+            recipe_id__in={recipe for _, recipe in dates}
+        ).only('pk', 'user_id', 'recipe_id', 'created')
+        to_update = []
+        for obj in saved:
+            key = (obj.user_id, obj.recipe_id)
+            if key not in dates:
+                continue
+            if dates[key] is not None:
+                obj.created = dates[key]
+            elif obj.created >= started:
+                obj.created = CREATED_BEFORE_TRACKING
+            else:
+                continue
+            to_update.append(obj)
+        self.model.objects.bulk_update(to_update, ('created',))
+        return result
+
+
+class FavoriteEntity(UserRecipeEntity):
+    name = 'favorites'
+    model = Favorite
+
+
+class ShoppingCartEntity(UserRecipeEntity):
+    name = 'carts'
+    model = ShoppingCart
+
+
+class FollowEntity(Entity):
+    name = 'follows'
+    model = Follow
+    fields = ('user', 'following')
+
+    def queryset(self):
+        return Follow.objects.select_related('user', 'following')
+
+    def to_record(self, obj):
+        return {'user': obj.user.email, 'following': obj.following.email}
+
+    def load(self, records):
+        users = users_by_email(
+            email for record in records
+            for email in (record['user'], record['following'])
+        )
+        objects = [
+            Follow(
+                user_id=resolve(users, record['user'], 'пользователь'),
+                following_id=resolve(
+                    users, record['following'], 'пользователь'
+                )
+            )
+            for record in records
+        ]
+        return upsert(Follow, objects, ('user_id', 'following_id'))
+
+
+# Порядок важен: каждый тип ссылается только на предыдущие.
+ENTITIES = {
+    entity.name: entity
+    for entity in (TagEntity(), IngredientEntity(), UserEntity(),
+                   RecipeEntity(), FavoriteEntity(), ShoppingCartEntity(),
+                   FollowEntity())
+}
@@ -0,0 +1,73 @@
+"""
+Рейтинг трендов рецептов: добавления в избранное и списки покупок
+с весом, который убывает вдвое за каждые TRENDING_HALF_LIFE часов.
+
+Рейтинг хранится в поле Recipe.trending_score и пересчитывается
+инкрементально (команда update_trending): сохраненные значения
+умножаются на коэффициент затухания за время с прошлого пересчета,
+затем прибавляется вклад добавлений, сделанных с тех пор. Удаление
+из избранного рейтинг не уменьшает.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from recipes.models import Favorite, Recipe, ShoppingCart, TrendingState
+from recipes.transfer import batches
+
+WEIGHTS = ((Favorite, 1.0), (ShoppingCart, 0.5))
+# Меньшие значения обнуляются, чтобы затухание не обновляло все рецепты.
+MIN_SCORE = 0.01
+# Без предыдущего пересчета учитываются добавления за столько периодов.
+REBUILD_HALF_LIVES = 10
+
+
+def decay(seconds):
+    """Коэффициент затухания веса за seconds секунд."""
+    return 0.5 ** (seconds / (settings.TRENDING_HALF_LIFE * 3600))
+
+
+@transaction.atomic
+def update_trending(rebuild=False, batch_size=1000):
+    """
+    Пересчитывает рейтинг трендов, возвращает количество рецептов
+    с новыми добавлениями. rebuild - пересчитать заново за последние
+    REBUILD_HALF_LIVES периодов полураспада.
+    """
+    # Время добавления задается до фиксации транзакции, поэтому
+    # пересчет идет на момент TRENDING_COMMIT_DELAY секунд назад: более
+    # новые добавления, видимые или нет, учитываются следующим пересчетом.
+    now = timezone.now() - timedelta(seconds=settings.TRENDING_COMMIT_DELAY)
+    state = TrendingState.objects.select_for_update().filter(pk=1).first()
+    if state is None or rebuild:
+        since = now - timedelta(
+            hours=settings.TRENDING_HALF_LIFE * REBUILD_HALF_LIVES
+        )
+        Recipe.objects.filter(trending_score__gt=0).update(trending_score=0)
+    else:
+        since = state.updated
+        factor = decay((now - since).total_seconds())
+        scored = Recipe.objects.filter(trending_score__gt=0)
+        scored.filter(trending_score__lt=MIN_SCORE / factor).update(
+            trending_score=0
+        )
+        scored.update(trending_score=F('trending_score') * factor)
+    deltas = defaultdict(float)
+    for model, weight in WEIGHTS:
+        added = model.objects.filter(
+            created__gt=since, created__lte=now
+        ).values_list('recipe_id', 'created').iterator()
+        for recipe_id, created in added:
+            age = (now - created).total_seconds()
+            deltas[recipe_id] += weight * decay(age)
+    for batch in batches(deltas.items(), batch_size):
+        Recipe.objects.bulk_update([
+            Recipe(pk=pk, trending_score=F('trending_score') + delta)
+            for pk, delta in batch
+        ], ('trending_score',))
+    TrendingState.objects.update_or_create(pk=1, defaults={'updated': now})
+    return len(deltas)
@@ -15,6 +15,7 @@ class CustomUserAdmin(UserAdmin):
         'email',
         'first_name',
         'last_name',
+        'recipes_count',
     )
     search_fields = ('username', 'email',)
 
@@ -4,7 +4,36 @@ from django.contrib.auth.validators import UnicodeUsernameValidator
 from django.db import models
 
 
-class User(AbstractUser):
+class CounterFieldsMixin:
+    """
+    Счетчики counter_fields изменяются только выражениями F() в сигналах.
+    Полное сохранение существующего объекта их не записывает: значения,
+    загруженные в начале запроса, к этому времени могли устареть.
+    """
+
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if (not args and kwargs.get('update_fields') is None
+                and not kwargs.get('force_insert')
+                and not self._state.adding):
+            kwargs['update_fields'] = self.fields_for_update()
+        super().save(*args, **kwargs)
+
+    def fields_for_update(self, *exclude):
+        """
+        Поля для save(update_fields=...): все загруженные поля, кроме
+        первичного ключа, счетчиков и exclude.
+        """
+        skipped = {*self.counter_fields, *exclude, *self.get_deferred_fields()}
+        return [
+            field.name for field in self._meta.concrete_fields
+            if not field.primary_key and field.name not in skipped
+            and field.attname not in skipped
+        ]
+
+
+class User(CounterFieldsMixin, AbstractUser):
     """Модель для пользователей."""
 
     username_validator = UnicodeUsernameValidator()
@@ -43,6 +72,13 @@ class User(AbstractUser):
         max_length=settings.MAXL_USERS_ATTRS,
         help_text='Обязательное. Не более 150 символов.'
     )
+    recipes_count = models.PositiveIntegerField(
+        'Количество рецептов',
+        default=0,
+        editable=False
+    )
+
+    counter_fields = ('recipes_count',)
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ('username', 'first_name', 'last_name')